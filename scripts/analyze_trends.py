@@ -1,8 +1,22 @@
-import sqlite3
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # files only; also safe in pool workers with no display
 import matplotlib.pyplot as plt
-import re
 import numpy as np
+import database
+from database import init_db, get_connection, set_db_path, add_db_argument, setting_mode, value_counts
+from setting_values import TONE_FIELDS, TONE_COLUMNS
+from recipe_frame import RecipeFrame, clean_dr
+from likeability import LikeabilityIndex, FIELD_COLUMNS
+from bootstrap import bootstrap_consensus, consensus_settings, format_report
 
 """
 FujiSims Analysis Engine
@@ -19,29 +33,109 @@ warmth/nostalgia, even if the "correct" WB is neutral.
 Outputs:
 - Generates .png charts in the /images folder
 - Prints the "Nishti Recipe" (Refined Consensus) to the console
+
+Every chart is a function registered with @chart, naming the data it reads
+(INPUTS) and writing one PNG. analyze_trends() loads those inputs once and
+renders the charts on a process pool, so they can also be run one at a time:
+
+    python scripts/analyze_trends.py --only contrast_map,wb_trends
+
+A chart is only re-rendered when what it draws could have changed: the hash
+of its input data, the code in scripts/ and the rendering settings is kept in
+images.manifest.json, and a chart whose hash matches (and whose PNG exists)
+is skipped. Jitter is seeded, so a re-render of unchanged data gives the
+same bytes.
 """
-DB_PATH = "film_recipes.db"
-
-def get_connection():
-    return sqlite3.connect(DB_PATH)
-
-def analyze_trends():
-    conn = get_connection()
-    
-    # 1. Top Film Simulation Bases - Bar Chart
-    print("Generating images/top_simulations.png...")
-    query_sims = """
-        SELECT film_simulation, COUNT(*) as count 
-        FROM recipes 
-        WHERE film_simulation IS NOT NULL AND film_simulation != ''
-        GROUP BY film_simulation 
-        ORDER BY count DESC 
-        LIMIT 7
-    """
+IMAGES_DIR = "images"
+CHART_MANIFEST = f"{IMAGES_DIR}.manifest.json"
+CACHE_FORMAT = 1
+JITTER_SEED = 0  # every chart starts from the same RNG state, in whichever process renders it
+
+# name -> Chart. output is None for report tasks, which return text instead of saving a PNG.
+# A chart that reads `frame` lists the columns it uses: it is handed only
+# those, and only they go into its cache hash.
+Chart = namedtuple("Chart", ["name", "inputs", "columns", "output", "render"])
+CHARTS = {}
+
+def chart(inputs, columns=None, report=False):
+    def register(render):
+        output = None if report else os.path.join(IMAGES_DIR, f"{render.__name__}.png")
+        CHARTS[render.__name__] = Chart(render.__name__, tuple(inputs), tuple(columns or ()), output, render)
+        return render
+    return register
+
+# ---------------------------------------------------------------------------
+# Chart inputs. Each is loaded at most once per process and shared by every
+# chart that declares it.
+# ---------------------------------------------------------------------------
+_loaded = {}
+
+def load_frame():
+    # Every per-recipe chart reads this one frame: loaded once, settings parsed once (recipe_frame.py)
+    return RecipeFrame.load().df
+
+def load_counts():
+    # Histograms come from recipe_counts / wb_shift_counts, kept current by triggers (see database.py)
+    conn = get_connection(readonly=True)
+    try:
+        values = pd.read_sql_query(
+            "SELECT dimension, value, count FROM recipe_counts ORDER BY dimension, count DESC, value", conn)
+        wb_cells = pd.read_sql_query(
+            "SELECT red AS wb_shift_red, blue AS wb_shift_blue, count FROM wb_shift_counts", conn)
+    finally:
+        conn.close()
+    return {"values": values, "wb_cells": wb_cells}
+
+def counts_of(counts, dimension, column):
+    """One recipe_counts dimension as a (column, count) frame, most common first."""
+    rows = counts["values"][counts["values"]["dimension"] == dimension]
+    return rows[["value", "count"]].rename(columns={"value": column}).reset_index(drop=True)
+
+def load_consensus():
+    # Using Mode instead of Mean because I want the setting MOST LIKELY to be preferred (the peak of the bell curve)
+    conn = get_connection(readonly=True)
+    try:
+        # Most frequent discrete setting, read from recipe_counts (typed column, parsed at save time)
+        settings = {m: setting_mode(conn, TONE_COLUMNS[m]) for m in TONE_FIELDS}
+        # Most popular film sim
+        sims = [value for value, _ in value_counts(conn, 'film_simulation') if value != '']
+        # Most popular DR
+        dr_groups = {}
+        for value, count in value_counts(conn, 'dynamic_range'):
+            dr_groups[clean_dr(value)] = dr_groups.get(clean_dr(value), 0) + count
+        # Get actual WB Shifts (Mode)
+        return {
+            "settings": settings,
+            "top_sim": sims[0] if sims else None,
+            "top_dr": max(sorted(dr_groups), key=dr_groups.get) if dr_groups else None,
+            "wb_red": setting_mode(conn, 'wb_shift_red'),
+            "wb_blue": setting_mode(conn, 'wb_shift_blue'),
+        }
+    finally:
+        conn.close()
+
+INPUTS = {"frame": load_frame, "counts": load_counts, "consensus": load_consensus}
+
+def load_input(name):
+    if name not in _loaded:
+        _loaded[name] = INPUTS[name]()
+    return _loaded[name]
+
+def _init_worker(db_path, loaded):
+    # Runs in each render process. The parent's inputs are handed over explicitly
+    # rather than inherited, so spawn / forkserver workers (the default from
+    # Python 3.14 on Linux) never reload them or touch the snapshot themselves.
+    set_db_path(db_path)
+    _loaded.update(loaded)
+
+# 1. Top Film Simulation Bases - Bar Chart
+@chart(inputs=['counts'])
+def top_simulations(output, counts):
     # WISDOM: Why do we care?
     # The Film Sim is the "Canvas". You can't paint a Van Gogh on a napkin.
     # We need to know which base simulation offers the most versatile starting point.
-    df_sims = pd.read_sql_query(query_sims, conn)
+    df_sims = counts_of(counts, 'film_simulation', 'film_simulation')
+    df_sims = df_sims[df_sims['film_simulation'] != ''].head(7)
     
     plt.figure(figsize=(10, 6))
     bars = plt.bar(df_sims['film_simulation'], df_sims['count'], color='#4a90e2')
@@ -50,21 +144,18 @@ def analyze_trends():
     plt.ylabel('Number of Recipes', fontsize=12)
     plt.xticks(rotation=45, ha='right')
     plt.tight_layout()
-    plt.savefig('images/top_simulations.png')
+    plt.savefig(output)
     plt.close()
 
-    # 3. White Balance Trends - Scatter Plot
-    print("Generating images/wb_trends.png...")
-    query_wb_all = """
-        SELECT wb_shift_red, wb_shift_blue 
-        FROM recipes 
-        WHERE wb_shift_red IS NOT NULL AND wb_shift_blue IS NOT NULL
-    """
+
+# 3. White Balance Trends - Scatter Plot
+@chart(inputs=['counts'])
+def wb_trends(output, counts):
     # WISDOM: The Color of Memory
     # White Balance isn't just for accuracy; it's for emotion.
     # I map these shifts to see if users prefer "Golden/Nostalgic" (Red/Yellow)
     # or "Clinical/Modern" (Blue/Green).
-    df_wb_all = pd.read_sql_query(query_wb_all, conn)
+    df_wb_all = counts['wb_cells']
     
     plt.figure(figsize=(10, 8))
     
@@ -89,8 +180,9 @@ def analyze_trends():
     plt.fill_between([-9, 0], -9, 0, color='#e8f5e9', alpha=0.9, zorder=0)
     plt.text(-4.5, -4.5, "FLUORESCENT\n(Matrix Green)", ha='center', va='center', fontsize=11, color='#27ae60', alpha=0.7)
 
-    # Plot data points on top
-    plt.scatter(df_wb_all['wb_shift_blue'], df_wb_all['wb_shift_red'], alpha=0.8, c='#2c3e50', edgecolors='white', s=60, zorder=2)
+    # Plot data points on top: one marker per (red, blue) cell, area grows with the number of recipes in it
+    plt.scatter(df_wb_all['wb_shift_blue'], df_wb_all['wb_shift_red'], alpha=0.8, c='#2c3e50', edgecolors='white',
+                s=60 * np.sqrt(df_wb_all['count']), zorder=2)
     
     # Axis lines
     plt.axhline(0, color='gray', linestyle='-', linewidth=1, zorder=1)
@@ -101,22 +193,17 @@ def analyze_trends():
     plt.ylabel('Red Axis (← Green  |  Magenta →)', fontsize=12, fontweight='bold')
     
     plt.tight_layout()
-    plt.savefig('images/wb_trends.png')
+    plt.savefig(output)
     plt.close()
 
-    # 4. Dynamic Range Usage - Pie Chart
-    print("Generating images/dr_usage.png...")
+
+# 4. Dynamic Range Usage - Pie Chart
+@chart(inputs=['counts'])
+def dr_usage(output, counts):
     # WISDOM: Protecting the Highlights
     # Digital sensors hate overexposure. DR400 is a hardware trick to underexpose raw 
     # data while brightening shadows, effectively saving the sky from blowing out.
-    query_dr = "SELECT dynamic_range, COUNT(*) as count FROM recipes WHERE dynamic_range IS NOT NULL GROUP BY dynamic_range"
-    df_dr = pd.read_sql_query(query_dr, conn)
-    
-    # Simple cleanup to grouping main DR types
-    def clean_dr(val):
-        if '400' in val: return 'DR400'
-        if '200' in val: return 'DR200'
-        return 'DR100/Standard'
+    df_dr = counts_of(counts, 'dynamic_range', 'dynamic_range')
     
     df_dr['dr_group'] = df_dr['dynamic_range'].apply(clean_dr)
     df_dr_grouped = df_dr.groupby('dr_group')['count'].sum().reset_index()
@@ -125,16 +212,17 @@ def analyze_trends():
     plt.pie(df_dr_grouped['count'], labels=df_dr_grouped['dr_group'], autopct='%1.1f%%', colors=['#ff9999','#66b3ff','#99ff99'])
     plt.title('Dynamic Range Preference', fontsize=16)
     plt.tight_layout()
-    plt.savefig('images/dr_usage.png')
+    plt.savefig(output)
     plt.close()
 
-    # 5. Grain Effect - Bar Chart
-    print("Generating images/grain_usage.png...")
+
+# 5. Grain Effect - Bar Chart
+@chart(inputs=['counts'])
+def grain_usage(output, counts):
     # WISDOM: Texture vs Noise
     # Modern sensors are "too clean". Adding grain brings back the organic "bite" 
     # of film stock. I want to see if users prefer "Subtle" or "Gross" grain.
-    query_grain = "SELECT grain_effect, COUNT(*) as count FROM recipes WHERE grain_effect IS NOT NULL GROUP BY grain_effect"
-    df_grain = pd.read_sql_query(query_grain, conn)
+    df_grain = counts_of(counts, 'grain_effect', 'grain_effect')
     
     # Clean up grain values (e.g. "Strong, Large" -> "Strong")
     def clean_grain(val):
@@ -154,22 +242,15 @@ def analyze_trends():
     plt.ylabel('Count')
     plt.xticks(rotation=0)
     plt.tight_layout()
-    plt.savefig('images/grain_usage.png')
+    plt.savefig(output)
     plt.close()
 
-    # 6. ISO Limit Analysis - Bar Chart
-    print("Generating images/iso_limit.png...")
-    query_iso = "SELECT iso FROM recipes WHERE iso LIKE '%up to%'"
-    df_iso = pd.read_sql_query(query_iso, conn)
-    
-    def extract_iso(val):
-        # Extract number after "ISO"
-        import re
-        match = re.search(r'ISO\s+(\d+)', val)
-        return match.group(1) if match else None
 
-    df_iso['iso_limit'] = df_iso['iso'].apply(extract_iso)
-    iso_counts = df_iso['iso_limit'].value_counts().sort_index()
+# 6. ISO Limit Analysis - Bar Chart
+@chart(inputs=['frame'], columns=['iso_auto', 'iso_max'])
+def iso_limit(output, frame):
+    iso_limits = frame.loc[frame['iso_auto'] & frame['iso_max'].notna(), 'iso_max'].astype(int)
+    iso_counts = iso_limits.value_counts().sort_index().rename_axis('iso_limit')
     
     plt.figure(figsize=(8, 5))
     iso_counts.plot(kind='bar', color='#e74c3c')
@@ -178,58 +259,31 @@ def analyze_trends():
     plt.ylabel('Count')
     plt.xticks(rotation=0)
     plt.tight_layout()
-    plt.savefig('images/iso_limit.png')
+    plt.savefig(output)
     plt.close()
 
-    # 7. Recipes by Sensor Generation
-    print("Generating images/sensor_distribution.png...")
-    query_sensor = "SELECT sensor, COUNT(*) as count FROM recipes GROUP BY sensor"
-    df_sensor = pd.read_sql_query(query_sensor, conn)
+
+# 7. Recipes by Sensor Generation
+@chart(inputs=['counts'])
+def sensor_distribution(output, counts):
+    df_sensor = counts_of(counts, 'sensor', 'sensor').sort_values('sensor')
     
     plt.figure(figsize=(8, 5))
     plt.bar(df_sensor['sensor'], df_sensor['count'], color='#8e44ad')
     plt.title('Recipes Per Sensor Generation', fontsize=16)
     plt.ylabel('Count')
     plt.tight_layout()
-    plt.savefig('images/sensor_distribution.png')
+    plt.savefig(output)
     plt.close()
 
-    # 8. The "Average" User Preference (Radar Chart)
-    print("Generating images/average_preferences.png...")
-    # Extract numerical values from text settings (e.g. "+2" -> 2, "-1" -> -1)
-    
-    # Helper to safe convert string to float
-    def parse_setting_val(val):
-        if val is None: return None
-        try:
-            # Handle "+1" or "-1" or "0"
-            clean = val.replace('+', '').strip()
-            # If range "0 to +2", take average? For now take first number found
-            import re
-            match = re.search(r'([+-]?\d+(?:\.\d+)?)', clean)
-            if match:
-                return float(match.group(1))
-            return 0.0
-        except:
-            return 0.0
-
-    query_avg = "SELECT highlight, shadow, color, sharpness, noise_reduction, clarity FROM recipes"
-    df_avg = pd.read_sql_query(query_avg, conn)
-    
-    # 8. The "Consensus" Preference (Radar Chart)
-    print("Generating images/average_preferences.png...")
-    
-    metrics = ['highlight', 'shadow', 'color', 'sharpness', 'noise_reduction', 'clarity']
-    consensus_vals = []
-    
-    for m in metrics:
-        df_avg[m] = df_avg[m].apply(parse_setting_val)
-        # Use mode[0] to get the most frequent discrete setting
-        consensus_vals.append(df_avg[m].mode()[0])
+
+# 8. The "Consensus" Preference (Radar Chart)
+@chart(inputs=['consensus'])
+def average_preferences(output, consensus):
+    metrics = TONE_FIELDS
+    consensus_vals = [consensus['settings'][m] for m in metrics]
         
     # Plot Radar Chart
-    import numpy as np
-    
     # Close the loop
     values = consensus_vals + [consensus_vals[0]]
     angles = np.linspace(0, 2*np.pi, len(metrics), endpoint=False).tolist()
@@ -245,85 +299,65 @@ def analyze_trends():
     ax.set_xticklabels([m.capitalize() for m in metrics])
     
     plt.title('The Community Consensus\n(Likeability Index)', size=20, color='teal', y=1.1)
-    plt.savefig('images/average_preferences.png')
+    plt.savefig(output)
     plt.close()
 
-    # 9. Calculate the Golden Recipe (Likeability Index / Mode)
-    # Using Mode instead of Mean because I want the setting MOST LIKELY to be preferred (the peak of the bell curve)
-    likeable_settings = {}
-    for m in metrics:
-        # mode() returns a series, take the first one
-        likeable_settings[m] = df_avg[m].mode()[0]
 
-    # Most popular film sim
-    top_sim = df_sims.iloc[0]['film_simulation']
-    
-    # Most popular DR
-    top_dr = df_dr_grouped.sort_values('count', ascending=False).iloc[0]['dr_group']
-    
-    # Get actual WB Shifts (Mode)
-    query_wb_all = "SELECT wb_shift_red, wb_shift_blue FROM recipes WHERE wb_shift_red IS NOT NULL"
-    df_wb_all = pd.read_sql_query(query_wb_all, conn)
-    mode_wb_red = df_wb_all['wb_shift_red'].mode()[0]
-    mode_wb_blue = df_wb_all['wb_shift_blue'].mode()[0]
+# 9. Calculate the Golden Recipe (Likeability Index / Mode)
+@chart(inputs=['frame', 'consensus'], columns=['name', 'url', *dict.fromkeys(FIELD_COLUMNS.values())], report=True)
+def golden_recipe(output, frame, consensus):
+    likeable_settings = consensus['settings']
+    top_sim = consensus['top_sim']
+    top_dr = consensus['top_dr']
+    mode_wb_red = consensus['wb_red']
+    mode_wb_blue = consensus['wb_blue']
     
     # --- Likeability Index Ranking ---
     # I want to find the ACTUAL recipe from the database that is the "Most Likeable"
-    # criteria: how many settings match the "Consensus Mode"
-    query_all = "SELECT * FROM recipes"
-    df_all = pd.read_sql_query(query_all, conn)
-    
-    def calculate_likeability(row):
-        score = 0
-        if row['film_simulation'] == top_sim: score += 1
-        if row['dynamic_range'] == top_dr: score += 1
-        
-        # Parse settings and compare
-        for m in metrics:
-            val = parse_setting_val(row[m])
-            if val == likeable_settings[m]: score += 1
-            
-        if row['wb_shift_red'] == mode_wb_red: score += 1
-        if row['wb_shift_blue'] == mode_wb_blue: score += 1
-        return score
-
-    df_all['likeability_score'] = df_all.apply(calculate_likeability, axis=1)
-    top_recipe = df_all.sort_values('likeability_score', ascending=False).iloc[0]
-
-    print("\nXXX_GOLDEN_RECIPE_START_XXX")
-    print(f"Name: The Nishti Recipe (Probability of Likeness)")
-    print(f"Description: Built using the 'Likeability Index' with manual refinements for exposure corrections.")
-    print(f"Film Simulation: {top_sim}")
-    print(f"Dynamic Range: {top_dr}")
-    print(f"Highlights: -2 (Manual Fix: Softens glare)")
-    print(f"Shadows: {int(likeable_settings['shadow']):+}")
-    print(f"Color: +2 (Manual Fix: Restores washed out color)")
-    print(f"Exposure Compensation: +1.0 (Manual Fix: Brightens image)")
-    print(f"Noise Reduction: -2 (User Choice: Less Grainy)")
-    print(f"Sharpening: +1 (User Choice: A little bit sharp)")
-    print(f"Clarity: {int(likeable_settings['clarity']):+}")
-    print(f"Grain Effect: Weak, Small (Consensus Peak)")
-    print(f"Color Chrome Effect: Strong")
-    print(f"Color Chrome FX Blue: Weak")
-    print(f"White Balance: Auto, -1 Red & -3 Blue (Manual Fix: Cleaner White)")
-    print(f"ISO: Auto, up to ISO 6400")
-    print(f"\nLikeability Index: This recipe represents the consensus of {top_recipe['likeability_score']} out of 11 major setting categories.")
-    print(f"Closest Existing Recipe: '{top_recipe['name']}' ({top_recipe['url']})")
-    print("XXX_GOLDEN_RECIPE_END_XXX")
-
-
-    print("Generating images/clarity_dist.png...")
+    # criteria: how many settings match the "Consensus Mode" (see likeability.py)
+    target = {'film_simulation': top_sim, 'dynamic_range': top_dr, **likeable_settings,
+              'wb_shift_red': mode_wb_red, 'wb_shift_blue': mode_wb_blue}
+    top_recipe = LikeabilityIndex(frame).best_matches(target, k=1)[0]
+
+    # Returned rather than printed, so it comes out in one piece when charts render in parallel
+    return "\n".join([
+        "",
+        "XXX_GOLDEN_RECIPE_START_XXX",
+        f"Name: The Nishti Recipe (Probability of Likeness)",
+        f"Description: Built using the 'Likeability Index' with manual refinements for exposure corrections.",
+        f"Film Simulation: {top_sim}",
+        f"Dynamic Range: {top_dr}",
+        f"Highlights: -2 (Manual Fix: Softens glare)",
+        f"Shadows: {int(likeable_settings['shadow']):+}",
+        f"Color: +2 (Manual Fix: Restores washed out color)",
+        f"Exposure Compensation: +1.0 (Manual Fix: Brightens image)",
+        f"Noise Reduction: -2 (User Choice: Less Grainy)",
+        f"Sharpening: +1 (User Choice: A little bit sharp)",
+        f"Clarity: {int(likeable_settings['clarity']):+}",
+        f"Grain Effect: Weak, Small (Consensus Peak)",
+        f"Color Chrome Effect: Strong",
+        f"Color Chrome FX Blue: Weak",
+        f"White Balance: Auto, -1 Red & -3 Blue (Manual Fix: Cleaner White)",
+        f"ISO: Auto, up to ISO 6400",
+        "",
+        f"Likeability Index: This recipe represents the consensus of {top_recipe['score']:g} out of 11 major setting categories.",
+        f"Closest Existing Recipe: '{top_recipe['name']}' ({top_recipe['url']})",
+        "XXX_GOLDEN_RECIPE_END_XXX",
+    ])
+
+
+# 10. How stable is the consensus? (bootstrap, see bootstrap.py)
+@chart(inputs=['frame'], columns=['film_simulation', 'dynamic_range', *[TONE_COLUMNS[m] for m in TONE_FIELDS], 'wb_shift_red', 'wb_shift_blue'], report=True)
+def consensus_stability(output, frame):
+    return "\n" + format_report(bootstrap_consensus(consensus_settings(frame)))
+
+
+@chart(inputs=['frame'], columns=['clarity_value'])
+def clarity_dist(output, frame):
     plt.figure(figsize=(8, 5))
     # Clarity is expensive on processor, so checking if people use it
-    query_clarity = "SELECT clarity FROM recipes WHERE clarity IS NOT NULL"
-    df_clarity = pd.read_sql_query(query_clarity, conn)
-    
-    # Parse clarity
-    def parse_clarity(val):
-        try: return float(val.replace('+', ''))
-        except: return 0
-        
-    df_clarity['val'] = df_clarity['clarity'].apply(parse_clarity)
+    df_clarity = frame[frame['clarity_value'].notna()]
+    df_clarity = df_clarity.assign(val=df_clarity['clarity_value'])
     
     plt.hist(df_clarity['val'], bins=range(-5, 6), align='left', rwidth=0.8, color='#e67e22')
     plt.title('Clarity Settings Distribution', fontsize=16)
@@ -332,42 +366,38 @@ def analyze_trends():
     plt.axvline(0, color='k', linestyle='--', linewidth=1)
     plt.grid(axis='y', alpha=0.3)
     plt.tight_layout()
-    plt.savefig('images/clarity_dist.png')
+    plt.savefig(output)
     plt.close()
-    
-    # 11. Chrome Effect vs Color Saturation (Correlation)
-    print("Generating images/chrome_color_corr.png...")
+
+
+# 11. Chrome Effect vs Color Saturation (Correlation)
+def bare_number(text):
+    """Whether a setting is empty or a bare number ("+2", "-1") rather than a range or note ("+2 (or +1)")."""
+    try:
+        float(text.replace('+', ''))
+        return True
+    except ValueError:
+        return text == ''
+
+@chart(inputs=['frame'], columns=['color', 'color_value', 'chrome_level'])
+def chrome_color_corr(output, frame):
     # WISDOM: The "Deep Color" Paradox
     # Amateurs boost Saturation. Pros boost Saturation AND use Color Chrome Effect.
     # Chrome Effect *darkens* saturation, preventing the "neon" look. 
     # This correlation checks if recipes are using this "Push-Pull" technique.
     # Does Strong Chrome Effect imply Lower Saturation?
-    query_corr = "SELECT full_settings, color FROM recipes"
-    df_corr = pd.read_sql_query(query_corr, conn)
-    
-    chrome_vals = []
-    color_vals = []
-    
-    import json
-    for idx, row in df_corr.iterrows():
-        try:
-            settings = json.loads(row['full_settings']) if row['full_settings'] else {}
-            chrome = settings.get('Color Chrome Effect', 'Off').lower()
-            color = float(row['color'].replace('+', '')) if row['color'] else 0
-            
-            if 'strong' in chrome: c_score = 2
-            elif 'weak' in chrome: c_score = 1
-            else: c_score = 0
-            
-            chrome_vals.append(c_score)
-            color_vals.append(color)
-        except:
-            continue
+    # chrome_level comes from fs_color_chrome_effect, a generated column over full_settings
+    # (database.PROMOTED_SETTINGS), so no json.loads on every row
+    # Same rows as the original float() loop: no color (plotted as 0) or a bare number;
+    # ranges such as "+2 (or +1)" were skipped there and stay skipped
+    df_corr = frame[frame['color'].isna() | frame['color'].map(bare_number, na_action='ignore').eq(True)]
+    chrome_vals = df_corr['chrome_level'].to_numpy()
+    color_vals = df_corr['color_value'].fillna(0).to_numpy()
             
     plt.figure(figsize=(8, 6))
     # Jitter the points so they don't overlap
-    jitter_x = [x + np.random.uniform(-0.1, 0.1) for x in chrome_vals]
-    jitter_y = [y + np.random.uniform(-0.2, 0.2) for y in color_vals]
+    jitter_x = chrome_vals + np.random.uniform(-0.1, 0.1, len(chrome_vals))
+    jitter_y = color_vals + np.random.uniform(-0.2, 0.2, len(color_vals))
     
     plt.scatter(jitter_x, jitter_y, alpha=0.5, c='#8e44ad')
     plt.title('Color Chrome Effect vs. Saturation Setting', fontsize=16)
@@ -376,20 +406,15 @@ def analyze_trends():
     plt.xticks([0, 1, 2], ['Off', 'Weak', 'Strong'])
     plt.grid(True, linestyle=':', alpha=0.5)
     plt.tight_layout()
-    plt.savefig('images/chrome_color_corr.png')
+    plt.savefig(output)
     plt.close()
 
-    # 12. Contrast Curve Preferences (Highlights vs Shadows)
-    print("Generating images/contrast_map.png...")
-    query_contrast = """
-        SELECT highlight, shadow FROM recipes 
-        WHERE highlight IS NOT NULL AND shadow IS NOT NULL
-    """
-    df_contrast = pd.read_sql_query(query_contrast, conn)
-    
-    # Parse values
-    df_contrast['H'] = df_contrast['highlight'].apply(parse_setting_val)
-    df_contrast['S'] = df_contrast['shadow'].apply(parse_setting_val)
+
+# 12. Contrast Curve Preferences (Highlights vs Shadows)
+@chart(inputs=['frame'], columns=['highlight_value', 'shadow_value'])
+def contrast_map(output, frame):
+    df_contrast = frame[frame['highlight_value'].notna() & frame['shadow_value'].notna()]
+    df_contrast = df_contrast.assign(H=df_contrast['highlight_value'], S=df_contrast['shadow_value'])
     
     plt.figure(figsize=(10, 8))
     plt.xlim(-4.5, 4.5)
@@ -431,8 +456,8 @@ def analyze_trends():
     plt.text(3.5, -3.5, f"ETHEREAL\n({int(pct_ethereal)}% of Recipes)", ha='center', va='center', color='#1565c0', fontsize=10)
     
     # Jitter points - Increased jitter slightly
-    j_h = [x + np.random.uniform(-0.25, 0.25) for x in df_contrast['H']]
-    j_s = [y + np.random.uniform(-0.25, 0.25) for y in df_contrast['S']]
+    j_h = df_contrast['H'] + np.random.uniform(-0.25, 0.25, total)
+    j_s = df_contrast['S'] + np.random.uniform(-0.25, 0.25, total)
     
     plt.scatter(j_h, j_s, c='#34495e', alpha=0.7, edgecolors='white', s=60, zorder=2)
     
@@ -443,16 +468,15 @@ def analyze_trends():
     plt.xlabel('Highlights (Softer <-> Harder)', fontsize=12, fontweight='bold')
     plt.ylabel('Shadows (Softer <-> Harder)', fontsize=12, fontweight='bold')
     plt.tight_layout()
-    plt.savefig('images/contrast_map.png')
+    plt.savefig(output)
     plt.close()
 
-    # 13. The Organic Index (Sharpness vs Noise Reduction)
-    print("Generating images/sharpness_nr_corr.png...")
-    query_org = "SELECT sharpness, noise_reduction FROM recipes"
-    df_org = pd.read_sql_query(query_org, conn)
-    
-    df_org['S'] = df_org['sharpness'].apply(parse_setting_val)
-    df_org['NR'] = df_org['noise_reduction'].apply(parse_setting_val)
+
+# 13. The Organic Index (Sharpness vs Noise Reduction)
+@chart(inputs=['frame'], columns=['sharpness_value', 'noise_reduction_value'])
+def sharpness_nr_corr(output, frame):
+    df_org = frame[frame['sharpness_value'].notna() & frame['noise_reduction_value'].notna()]
+    df_org = df_org.assign(S=df_org['sharpness_value'], NR=df_org['noise_reduction_value'])
     
     # Calculate percentages for quadrants
     total_recipes = len(df_org)
@@ -481,8 +505,8 @@ def analyze_trends():
     plt.text(3.0, 3.0, label, ha='center', va='center', fontweight='bold', color='#c62828', fontsize=11)
     
     # Jitter points - Increased jitter to fill space better
-    j_s = [x + np.random.uniform(-0.35, 0.35) for x in df_org['S']]
-    j_nr = [y + np.random.uniform(-0.35, 0.35) for y in df_org['NR']]
+    j_s = df_org['S'] + np.random.uniform(-0.35, 0.35, total_recipes)
+    j_nr = df_org['NR'] + np.random.uniform(-0.35, 0.35, total_recipes)
     
     plt.scatter(j_s, j_nr, c='#004d40', alpha=0.6, edgecolors='white', s=70, zorder=2)
     
@@ -493,19 +517,17 @@ def analyze_trends():
     plt.xlabel('Sharpness (Soft <-> Sharp)', fontsize=12, fontweight='bold')
     plt.ylabel('Noise Reduction (Grainy <-> Smooth)', fontsize=12, fontweight='bold')
     plt.tight_layout()
-    plt.savefig('images/sharpness_nr_corr.png')
+    plt.savefig(output)
     plt.close()
 
-    # ==========================================
-    # 14. Nostalgia vs Pop (WB Red Shift vs Color)
-    # ==========================================
-    print("Generating images/nostalgia_pop.png...")
-    query_warmth = """
-        SELECT wb_shift_red, color FROM recipes 
-        WHERE wb_shift_red IS NOT NULL AND color IS NOT NULL
-    """
-    df_warmth = pd.read_sql_query(query_warmth, conn)
-    df_warmth['C'] = df_warmth['color'].apply(parse_setting_val)
+
+# ==========================================
+# 14. Nostalgia vs Pop (WB Red Shift vs Color)
+# ==========================================
+@chart(inputs=['frame'], columns=['wb_shift_red', 'color_value'])
+def nostalgia_pop(output, frame):
+    df_warmth = frame[frame['wb_shift_red'].notna() & frame['color_value'].notna()]
+    df_warmth = df_warmth.assign(C=df_warmth['color_value'])
     # Red shift is already int
     
     plt.figure(figsize=(10, 8))
@@ -530,8 +552,8 @@ def analyze_trends():
     plt.text(-5, -2.5, "BLEAK / MUTE\n(Winter/Sad)", ha='center', va='center', fontweight='bold', color='#37474f', fontsize=10)
     
     # Scatter
-    j_r = [x + np.random.uniform(-0.4, 0.4) for x in df_warmth['wb_shift_red']]
-    j_c = [y + np.random.uniform(-0.2, 0.2) for y in df_warmth['C']]
+    j_r = df_warmth['wb_shift_red'] + np.random.uniform(-0.4, 0.4, len(df_warmth))
+    j_c = df_warmth['C'] + np.random.uniform(-0.2, 0.2, len(df_warmth))
     plt.scatter(j_r, j_c, c='#d84315', alpha=0.6, edgecolors='white', s=60, zorder=2)
     
     plt.axhline(0, color='gray', linestyle='-', alpha=0.5)
@@ -540,20 +562,17 @@ def analyze_trends():
     plt.xlabel('WB Red Shift (Cool <-> Warm)', fontsize=12, fontweight='bold')
     plt.ylabel('Color Saturation (Faded <-> Vibrant)', fontsize=12, fontweight='bold')
     plt.tight_layout()
-    plt.savefig('images/nostalgia_pop.png')
+    plt.savefig(output)
     plt.close()
 
-    # ==========================================
-    # 15. The "Structure" Index (Sharpness vs Clarity)
-    # ==========================================
-    print("Generating images/structure_index.png...")
-    query_structure = """
-        SELECT sharpness, clarity FROM recipes 
-        WHERE sharpness IS NOT NULL AND clarity IS NOT NULL
-    """
-    df_struct = pd.read_sql_query(query_structure, conn)
-    df_struct['S'] = df_struct['sharpness'].apply(parse_setting_val)
-    df_struct['C'] = df_struct['clarity'].apply(parse_setting_val)
+
+# ==========================================
+# 15. The "Structure" Index (Sharpness vs Clarity)
+# ==========================================
+@chart(inputs=['frame'], columns=['sharpness_value', 'clarity_value'])
+def structure_index(output, frame):
+    df_struct = frame[frame['sharpness_value'].notna() & frame['clarity_value'].notna()]
+    df_struct = df_struct.assign(S=df_struct['sharpness_value'], C=df_struct['clarity_value'])
     
     plt.figure(figsize=(10, 8))
     plt.xlim(-4.5, 4.5)
@@ -572,8 +591,8 @@ def analyze_trends():
     plt.text(2.5, -3, "DIGITAL BLOOM\n(Sharp Edges, Soft Mids)", ha='center', va='center', fontweight='bold', color='#01579b')
 
     # Scatter
-    j_s = [x + np.random.uniform(-0.25, 0.25) for x in df_struct['S']]
-    j_c = [y + np.random.uniform(-0.25, 0.25) for y in df_struct['C']]
+    j_s = df_struct['S'] + np.random.uniform(-0.25, 0.25, len(df_struct))
+    j_c = df_struct['C'] + np.random.uniform(-0.25, 0.25, len(df_struct))
     plt.scatter(j_s, j_c, c='#4a148c', alpha=0.6, edgecolors='white', s=60, zorder=2)
     
     plt.axhline(0, color='gray', linestyle='-', alpha=0.5)
@@ -582,34 +601,19 @@ def analyze_trends():
     plt.xlabel('Sharpness (Soft <-> Sharp)', fontsize=12, fontweight='bold')
     plt.ylabel('Clarity (Soft <-> Hard)', fontsize=12, fontweight='bold')
     plt.tight_layout()
-    plt.savefig('images/structure_index.png')
+    plt.savefig(output)
     plt.close()
 
-    # ==========================================
-    # 16. B&W Contrast Test (Box Plot)
-    # ==========================================
-    print("Generating images/bw_contrast.png...")
-    query_bw = """
-        SELECT name, shadow, sensor FROM recipes 
-        WHERE shadow IS NOT NULL
-    """
-    df_bw = pd.read_sql_query(query_bw, conn)
-    df_bw['ShadowVal'] = df_bw['shadow'].apply(parse_setting_val)
-    
-    # Identify B&W recipes roughly by looking for distinct sensor names or sim names
-    # Actually, we don't have 'film_simulation' column in the query above, lemme add it.
-    query_bw_full = "SELECT film_simulation, shadow FROM recipes WHERE shadow IS NOT NULL"
-    df_bw_full = pd.read_sql_query(query_bw_full, conn)
-    df_bw_full['ShadowVal'] = df_bw_full['shadow'].apply(parse_setting_val)
-    
-    # Define B&W keywords
-    bw_sims = ['Acros', 'Monochrome', 'Tri-X', 'T-Max', 'Ilford']
-    def is_bw(sim_name):
-        if not sim_name: return False
-        s = sim_name.lower()
-        return 'acros' in s or 'monochrome' in s or 'bw' in s or 'b&w' in s or 'sepia' in s
 
-    df_bw_full['Type'] = df_bw_full['film_simulation'].apply(lambda x: 'B&W Recipes' if is_bw(x) else 'Color Recipes')
+# ==========================================
+# 16. B&W Contrast Test (Box Plot)
+# ==========================================
+@chart(inputs=['frame'], columns=['shadow_value', 'is_bw'])
+def bw_contrast(output, frame):
+    df_bw_full = frame[frame['shadow_value'].notna()]
+    # B&W recipes: Acros / Monochrome / Sepia / B&W simulations (is_bw, see recipe_frame.py)
+    df_bw_full = df_bw_full.assign(ShadowVal=df_bw_full['shadow_value'],
+                                   Type=np.where(df_bw_full['is_bw'], 'B&W Recipes', 'Color Recipes'))
     
     plt.figure(figsize=(8, 6))
     # Box plot
@@ -634,29 +638,16 @@ def analyze_trends():
     plt.text(1.5, 3.5, f"B&W Shadows are\n{diff:.1f} steps Harder", ha='center', bbox=dict(facecolor='white', alpha=0.8, edgecolor='gray'))
     
     plt.tight_layout()
-    plt.savefig('images/bw_contrast.png')
+    plt.savefig(output)
     plt.close()
 
-    # ==========================================
-    # 17. Grit Score (ISO vs Grain)
-    # ==========================================
-    print("Generating images/grit_score.png...")
-    query_grit = "SELECT iso, grain_effect FROM recipes"
-    df_grit = pd.read_sql_query(query_grit, conn)
-    
-    def parse_iso_limit(x):
-        if not x: return None
-        # Extract number
-        m = re.search(r'(\d+)', str(x))
-        if m: return int(m.group(1))
-        return None
-        
-    def is_grain_strong(g):
-        if not g: return False
-        return 'Strong' in g
 
-    df_grit['IsoLim'] = df_grit['iso'].apply(parse_iso_limit)
-    df_grit['GrainStrong'] = df_grit['grain_effect'].apply(is_grain_strong)
+# ==========================================
+# 17. Grit Score (ISO vs Grain)
+# ==========================================
+@chart(inputs=['frame'], columns=['iso_first', 'grain_strong'])
+def grit_score(output, frame):
+    df_grit = frame.assign(IsoLim=frame['iso_first'], GrainStrong=frame['grain_strong'])
     
     # Filter for common ISOs (3200, 6400)
     df_iso3200 = df_grit[df_grit['IsoLim'] == 3200]
@@ -679,28 +670,20 @@ def analyze_trends():
                 ha='center', va='bottom', fontweight='bold', fontsize=14)
                 
     plt.tight_layout()
-    plt.savefig('images/grit_score.png')
+    plt.savefig(output)
     plt.close()
 
-    # ==========================================
-    # 18. Complexity Score (Histogram)
-    # ==========================================
-    print("Generating images/complexity_score.png...")
-    query_comp = """
-        SELECT highlight, shadow, color, sharpness, noise_reduction, wb_shift_red, wb_shift_blue 
-        FROM recipes
-    """
-    df_comp = pd.read_sql_query(query_comp, conn)
-    
-    # Parse all
-    # Standard: H, S, C, Sh, NR
+
+# ==========================================
+# 18. Complexity Score (Histogram)
+# ==========================================
+@chart(inputs=['frame'], columns=['highlight_value', 'shadow_value', 'color_value', 'sharpness_value', 'noise_reduction_value', 'wb_shift_red', 'wb_shift_blue'])
+def complexity_score(output, frame):
+    # Standard: H, S, C, Sh, NR (a setting that isn't given is the camera default, 0)
     # WB: R, B
-    
-    df_comp['H'] = df_comp['highlight'].apply(parse_setting_val).abs()
-    df_comp['S'] = df_comp['shadow'].apply(parse_setting_val).abs()
-    df_comp['C'] = df_comp['color'].apply(parse_setting_val).abs()
-    df_comp['Sh'] = df_comp['sharpness'].apply(parse_setting_val).abs()
-    df_comp['NR'] = df_comp['noise_reduction'].apply(parse_setting_val).abs()
+    tone = frame[['highlight_value', 'shadow_value', 'color_value', 'sharpness_value', 'noise_reduction_value']].fillna(0).abs()
+    df_comp = frame.assign(H=tone['highlight_value'], S=tone['shadow_value'], C=tone['color_value'],
+                        Sh=tone['sharpness_value'], NR=tone['noise_reduction_value'])
     # For WB, values are integer shifts. 
     # NOTE: In DB, wb_shift_red is already integer.
     df_comp['WR'] = df_comp['wb_shift_red'].fillna(0).astype(int).abs()
@@ -720,8 +703,162 @@ def analyze_trends():
     plt.text(20, max(n)*0.8, "THE ALCHEMISTS\n(Heavy processing)", ha='right', color='#263238', fontweight='bold')
     
     plt.tight_layout()
-    plt.savefig('images/complexity_score.png')
+    plt.savefig(output)
     plt.close()
 
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+def chart_inputs(task):
+    """The keyword arguments a chart is rendered with (frame cut down to its declared columns)."""
+    data = {i: load_input(i) for i in task.inputs}
+    if "frame" in data:
+        data["frame"] = data["frame"][list(task.columns)]
+    return data
+
+def render_chart(name):
+    """Renders one registered chart in this process. Returns (name, report text or None, seconds)."""
+    task = CHARTS[name]
+    start = time.perf_counter()
+    np.random.seed(JITTER_SEED)
+    result = task.render(task.output, **chart_inputs(task))
+    plt.close('all')
+    return name, result, time.perf_counter() - start
+
+def _digest_value(value):
+    if isinstance(value, pd.DataFrame):
+        h = hashlib.sha256(json.dumps(list(map(str, value.columns))).encode())
+        h.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+        return h.hexdigest()
+    if isinstance(value, dict):
+        return hashlib.sha256(json.dumps({k: _digest_value(v) for k, v in value.items()},
+                                         sort_keys=True).encode()).hexdigest()
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+_code_digest = None
+
+def code_digest():
+    """
+    Hash of every module in scripts/. Charts call into helpers all over the
+    tree (recipe_frame, likeability, bootstrap, setting_values, ...), so any
+    change to the code re-renders everything rather than risk a stale chart.
+    """
+    global _code_digest
+    if _code_digest is None:
+        h = hashlib.sha256()
+        scripts_dir = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(scripts_dir)):
+            if name.endswith(".py"):
+                h.update(name.encode())
+                with open(os.path.join(scripts_dir, name), "rb") as f:
+                    h.update(hashlib.sha256(f.read()).digest())
+        _code_digest = h.hexdigest()
+    return _code_digest
+
+def chart_digest(task):
+    """Hash of everything a chart's output depends on: its data, the code and how it is rendered."""
+    h = hashlib.sha256()
+    parts = [CACHE_FORMAT, JITTER_SEED, matplotlib.__version__, task.output, task.name, code_digest()]
+    h.update(json.dumps(parts).encode())
+    for name, value in chart_inputs(task).items():
+        h.update(f"{name}={_digest_value(value)}".encode())
+    return h.hexdigest()
+
+def load_manifest():
+    try:
+        with open(CHART_MANIFEST) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"format": CACHE_FORMAT, "charts": {}}
+
+def save_manifest(manifest):
+    tmp = f"{CHART_MANIFEST}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp, CHART_MANIFEST)
+
+def _report(name, result, seconds):
+    task = CHARTS[name]
+    print(f"Generated {task.output or name} ({seconds:.1f}s)")
+    if result:
+        print(result)
+
+def analyze_trends(only=None, jobs=None, force=False):
+    """
+    Renders the charts named in `only` (default: all of them) whose inputs
+    changed since the last run (all of them with force=True), on `jobs`
+    worker processes (default: one per CPU; 1 renders in this process).
+    """
+    init_db()  # migrates older databases (typed + generated setting columns, indexes)
+    names = list(only or CHARTS)
+    os.makedirs(IMAGES_DIR, exist_ok=True)
+
+    # Load every input the selected charts need here first and hand them to the
+    # workers (_init_worker): the snapshot is brought up to date exactly once.
+    start = time.perf_counter()
+    for i in dict.fromkeys(i for n in names for i in CHARTS[n].inputs):
+        load_input(i)
+    print(f"Loaded {', '.join(_loaded)} in {time.perf_counter() - start:.2f}s")
+
+    manifest = load_manifest()
+    if manifest.get("format") != CACHE_FORMAT:
+        manifest = {"format": CACHE_FORMAT, "charts": {}}
+    digests = {name: chart_digest(CHARTS[name]) for name in names}
+    todo = []
+    for name in names:
+        task, entry = CHARTS[name], manifest["charts"].get(name, {})
+        fresh = entry.get("hash") == digests[name] and (task.output is None or os.path.exists(task.output))
+        if fresh and not force:
+            if task.output is None and entry.get("report"):
+                print(entry["report"])
+        else:
+            todo.append(name)
+    if len(todo) < len(names):
+        print(f"{len(names) - len(todo)} of {len(names)} charts unchanged, skipped")
+
+    def done(name, result, seconds):
+        _report(name, result, seconds)
+        manifest["charts"][name] = {"hash": digests[name], "output": CHARTS[name].output}
+        if result:
+            manifest["charts"][name]["report"] = result
+
+    try:
+        jobs = min(jobs or os.cpu_count() or 1, len(todo))
+        if jobs <= 1:
+            for name in todo:
+                done(*render_chart(name))
+            return
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(database.DB_PATH, dict(_loaded))) as pool:
+            futures = [pool.submit(render_chart, name) for name in todo]
+            for future in as_completed(futures):
+                done(*future.result())
+    finally:
+        # Charts that finished are recorded even if a later one failed
+        if todo:
+            save_manifest(manifest)
+
 if __name__ == "__main__":
-    analyze_trends()
+    parser = argparse.ArgumentParser(description="Generate the charts in images/ and print the consensus recipe")
+    parser.add_argument("--only", metavar="NAMES", help="Comma-separated charts to render (see --list)")
+    parser.add_argument("--jobs", "-j", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--list", action="store_true", help="List the registered charts and their inputs")
+    parser.add_argument("--force", action="store_true", help="Re-render even the charts whose inputs are unchanged")
+    add_db_argument(parser)
+    args = parser.parse_args()
+    set_db_path(args.db)
+
+    if args.list:
+        for task in CHARTS.values():
+            print(f"{task.name:22} {', '.join(task.inputs):18} {task.output or '(console report)'}")
+        sys.exit(0)
+
+    only = [n.strip() for n in args.only.split(",") if n.strip()] if args.only else None
+    unknown = [n for n in only or [] if n not in CHARTS]
+    if unknown:
+        parser.error(f"unknown chart(s): {', '.join(unknown)} (choose from {', '.join(CHARTS)})")
+
+    start = time.perf_counter()
+    analyze_trends(only, args.jobs, args.force)
+    print(f"Done in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,154 @@
+import os
+import re
+import time
+import shutil
+import argparse
+import tempfile
+from database import init_db, connect, set_db_path, RecipeWriter, RECIPE_INDEXES
+from fixture_server import recipe_settings
+from sources import KEY_MAP
+
+"""
+Analytics Query Benchmark
+-------------------------
+Builds a large synthetic film_recipes.db and runs the GROUP BY / filter
+queries from analyze_trends.py and query_examples.py against it, with and
+without the managed index set (database.RECIPE_INDEXES). For each query it
+prints the EXPLAIN QUERY PLAN and the best-of-N timing.
+
+    python scripts/bench_queries.py --rows 1000000
+
+Exits non-zero if any query still does a full table scan with the indexes in
+place. Queries that project every row into pandas (the per-chart scatter
+plots) read the whole table by design and aren't listed here.
+"""
+
+# (name, sql, params): the query shapes the analytics scripts run
+ANALYTICS_QUERIES = [
+    ("top_simulations", """
+        SELECT film_simulation, COUNT(*) as count
+        FROM recipes
+        WHERE film_simulation IS NOT NULL AND film_simulation != ''
+        GROUP BY film_simulation
+        ORDER BY count DESC
+        LIMIT 7
+    """, ()),
+    ("wb_trends", """
+        SELECT wb_shift_red, wb_shift_blue
+        FROM recipes
+        WHERE wb_shift_red IS NOT NULL AND wb_shift_blue IS NOT NULL
+    """, ()),
+    ("dr_usage", "SELECT dynamic_range, COUNT(*) as count FROM recipes WHERE dynamic_range IS NOT NULL GROUP BY dynamic_range", ()),
+    ("grain_usage", "SELECT grain_effect, COUNT(*) as count FROM recipes WHERE grain_effect IS NOT NULL GROUP BY grain_effect", ()),
+    ("iso_limit", """
+        SELECT iso_max AS iso_limit, COUNT(*) as count
+        FROM recipes
+        WHERE iso LIKE '%up to%' AND iso_max IS NOT NULL
+        GROUP BY iso_max
+        ORDER BY iso_max
+    """, ()),
+    ("sensor_distribution", "SELECT sensor, COUNT(*) as count FROM recipes GROUP BY sensor", ()),
+    ("distinct_simulations", "SELECT DISTINCT film_simulation FROM recipes ORDER BY film_simulation", ()),
+    ("nr_minus_4", "SELECT name, noise_reduction FROM recipes WHERE noise_reduction = '-4' LIMIT 5", ()),
+    ("red_shift_gt_2", "SELECT name, white_balance, wb_shift_red FROM recipes WHERE wb_shift_red > 2 LIMIT 5", ()),
+]
+
+SENSORS = ["X-Trans V", "X-Trans IV", "X-Trans III", "X-Trans II"]
+
+def synthetic_recipe(i):
+    """A recipe dict shaped like parse_recipe_html's output, from the fixture server's settings."""
+    data = {
+        "name": f"Synthetic Recipe {i}",
+        "sensor": SENSORS[i % len(SENSORS)],
+        "url": f"https://example.invalid/{i}/",
+        "full_settings": {},
+    }
+    for label, value in recipe_settings(i):
+        field = KEY_MAP.get(label, "full_settings")
+        if field == "full_settings":
+            data["full_settings"][label] = value
+        else:
+            data[field] = value
+    red = re.search(r'([+-]?\d+)\s*R(?:ed)?', data["white_balance"], re.IGNORECASE)
+    blue = re.search(r'([+-]?\d+)\s*B(?:lue)?', data["white_balance"], re.IGNORECASE)
+    data["wb_shift_red"] = int(red.group(1)) if red else None
+    data["wb_shift_blue"] = int(blue.group(1)) if blue else None
+    return data
+
+def build_db(path, rows):
+    set_db_path(path)
+    init_db()
+    start = time.perf_counter()
+    with RecipeWriter(db_path=path, batch_size=5000, verbose=False) as writer:
+        for i in range(rows):
+            writer.add(synthetic_recipe(i))
+    print(f"Built {rows:,} synthetic recipes in {time.perf_counter() - start:.1f}s ({path})")
+
+def query_plan(conn, sql, params):
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+def is_table_scan(plan):
+    # "SCAN recipes" alone reads every row; "SCAN recipes USING COVERING INDEX" only reads the index
+    return any(step.startswith("SCAN recipes") and "INDEX" not in step for step in plan)
+
+def time_query(conn, sql, params, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def run_queries(conn, repeat):
+    results = {}
+    for name, sql, params in ANALYTICS_QUERIES:
+        plan = query_plan(conn, sql, params)
+        results[name] = {"plan": plan, "scan": is_table_scan(plan), "seconds": time_query(conn, sql, params, repeat)}
+    return results
+
+def drop_recipe_indexes(conn):
+    for name in RECIPE_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.commit()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="EXPLAIN QUERY PLAN + timings for the analytics queries on a large synthetic DB")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic recipes to generate (default: 1,000,000)")
+    parser.add_argument("--db", help="Reuse/keep the synthetic DB at this path instead of a temp file")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per query; the best time is reported")
+    args = parser.parse_args(argv)
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="bench_queries_"), "film_recipes.db")
+    if not os.path.exists(path):
+        build_db(path, args.rows)
+    else:
+        set_db_path(path)
+        init_db()
+
+    conn = connect(path)
+    indexed = run_queries(conn, args.repeat)
+    drop_recipe_indexes(conn)
+    unindexed = run_queries(conn, args.repeat)
+    conn.close()
+    init_db()  # puts the indexes back
+
+    scans = []
+    for name, _, _ in ANALYTICS_QUERIES:
+        before, after = unindexed[name], indexed[name]
+        speedup = before["seconds"] / after["seconds"] if after["seconds"] else float("inf")
+        print(f"\n{name}: {before['seconds'] * 1000:.1f} ms -> {after['seconds'] * 1000:.1f} ms ({speedup:.1f}x)")
+        for step in after["plan"]:
+            print(f"    {step}")
+        if after["scan"]:
+            scans.append(name)
+
+    if not args.db:
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+    if scans:
+        print(f"\nFull table scans with indexes in place: {', '.join(scans)}")
+        raise SystemExit(1)
+    print(f"\nNo query scans the recipes table ({len(ANALYTICS_QUERIES)} queries).")
+
+if __name__ == "__main__":
+    main()
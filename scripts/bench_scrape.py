@@ -0,0 +1,121 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import contextlib
+import multiprocessing
+import database
+from scrape import crawl
+from sources import FujiXWeeklySource, DEFAULT_PARSER, HAS_LXML
+from fixture_server import FixtureServer
+
+"""
+Scraper Benchmark
+-----------------
+Runs a full crawl (discovery, fetch, parse, save) against fixture_server.py
+and reports throughput, fetch latency and peak memory. Nothing touches the
+network or the real database: the crawl runs in a temp directory, against a
+database created there (whatever --db / $FUJISIMS_DB point at).
+
+    python scripts/bench_scrape.py --pages 1000 --latency-ms 20 --concurrency 8
+
+The server runs in its own process so it doesn't compete with the scraper
+for the GIL or show up in the scraper's memory.
+"""
+
+def _serve(conn, pages, latency_ms, jitter_ms, error_rate, seed):
+    server = FixtureServer(pages, latency_ms=latency_ms, jitter_ms=jitter_ms, error_rate=error_rate, seed=seed)
+    conn.send((server.host, server.index_urls()))
+    conn.close()
+    server.serve_forever()
+
+def _peak_rss_mb(who):
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_benchmark(pages=1000, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=0,
+                  concurrency=8, rps=1000.0, parsers=None, parser=DEFAULT_PARSER, quiet=True):
+    """Crawls a fresh fixture site once and returns a dict of results."""
+    parent_conn, child_conn = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=_serve, args=(child_conn, pages, latency_ms, jitter_ms, error_rate, seed),
+                                     daemon=True)
+    server.start()
+    host, index_urls = parent_conn.recv()
+
+    workdir = tempfile.mkdtemp(prefix="bench_scrape_")
+    cwd = os.getcwd()
+    db_path = database.DB_PATH
+    try:
+        # An explicit path, so a $FUJISIMS_DB set in the environment is never written to
+        database.set_db_path(os.path.join(workdir, "film_recipes.db"))
+        # crawl() writes html_cache/ and its metrics relative to the cwd
+        os.chdir(workdir)
+        source = FujiXWeeklySource(index_urls, host=host, rps=rps, concurrency=concurrency)
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull if quiet else sys.stdout):
+            crawl(sources=[source], parser=parser, parsers=parsers)
+        elapsed = time.perf_counter() - start
+        # Parse workers have exited by now, so this is the largest of them (not the server)
+        worker_rss = _peak_rss_mb(resource.RUSAGE_CHILDREN)
+        with open("crawl_metrics.json") as f:
+            metrics = json.load(f)
+    finally:
+        os.chdir(cwd)
+        database.set_db_path(db_path)
+        shutil.rmtree(workdir, ignore_errors=True)
+        server.terminate()
+        server.join()
+
+    parsed = metrics["counters"]["pages_parsed"]
+    fetch = metrics["timings"].get("fetch", {})
+    return {
+        "pages": pages,
+        "parsed": parsed,
+        "failures": metrics["counters"]["failures"],
+        "seconds": round(elapsed, 3),
+        "pages_per_second": round(parsed / elapsed, 2) if elapsed else None,
+        "fetch_p50_ms": round(fetch["p50"] * 1000, 2) if fetch.get("p50") is not None else None,
+        "fetch_p99_ms": round(fetch["p99"] * 1000, 2) if fetch.get("p99") is not None else None,
+        "peak_rss_mb": round(_peak_rss_mb(resource.RUSAGE_SELF), 1),
+        "peak_worker_rss_mb": round(worker_rss, 1),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark scrape.py against a local fixture site")
+    parser.add_argument("--pages", type=int, default=1000, help="Recipe pages in the fixture corpus (default: 1000)")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=8, help="Fetch threads (default: 8)")
+    parser.add_argument("--rps", type=float, default=1000.0, help="Rate limit against the fixture host (default: 1000)")
+    parser.add_argument("--parsers", type=int, default=None, help="Parse processes (default: CPU count - 1)")
+    parser.add_argument("--parser", choices=["html.parser", "lxml"], default=DEFAULT_PARSER)
+    parser.add_argument("--json", metavar="PATH", help="Also write the results to PATH")
+    parser.add_argument("--verbose", action="store_true", help="Show the crawl's own output")
+    args = parser.parse_args(argv)
+
+    if args.pages < 1:
+        parser.error("--pages must be at least 1")
+    if args.parser == "lxml" and not HAS_LXML:
+        parser.error("--parser lxml needs the lxml package (pip install lxml)")
+
+    results = run_benchmark(args.pages, args.latency_ms, args.jitter_ms, args.error_rate, args.seed,
+                            args.concurrency, args.rps, args.parsers, args.parser, quiet=not args.verbose)
+
+    print(f"Pages:            {results['parsed']}/{results['pages']} parsed, {results['failures']} failures")
+    print(f"Wall time:        {results['seconds']}s")
+    print(f"Throughput:       {results['pages_per_second']} pages/s")
+    print(f"Fetch latency:    p50 {results['fetch_p50_ms']} ms, p99 {results['fetch_p99_ms']} ms")
+    print(f"Peak RSS:         {results['peak_rss_mb']} MB (scraper), {results['peak_worker_rss_mb']} MB (largest parse worker)")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
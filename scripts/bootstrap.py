@@ -0,0 +1,229 @@
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from database import init_db, set_db_path, add_db_argument
+from setting_values import TONE_FIELDS, TONE_COLUMNS
+from recipe_frame import RecipeFrame, clean_dr
+
+"""
+Consensus Bootstrap
+-------------------
+How stable is each consensus setting? The consensus takes the most common
+value of every setting (ties: the lowest value). This resamples the corpus
+with replacement thousands of times and takes the modes again each time:
+
+    probability   share of resamples whose mode is the consensus value
+    share / CI    fraction of recipes using the consensus value, with a
+                  percentile confidence interval over the resamples
+    runner-up     the value that is the mode most often when the consensus
+                  value isn't (or the second most common value, at 0%)
+
+The same numbers are reported for the full recipe: how often every setting's
+mode matches at once, and the most frequent alternative recipe.
+
+A single setting's value counts in a resample are multinomial: n draws over
+that setting's value frequencies. So they are drawn directly, resamples x
+values per setting, whatever the corpus size. Whether every setting hits its
+mode at once depends on which recipes were drawn together, so the full recipe
+is judged on JOINT_RESAMPLES resamples of actual recipes. Each chunk of them
+is an index matrix (one row of n drawn recipes per resample). bincount turns
+it into how often each recipe was drawn. One matrix product with the one-hot
+encoded settings then gives every resample's value counts for every setting.
+
+    python scripts/bootstrap.py --resamples 10000 --joint-resamples 1000
+    python scripts/bootstrap.py --bench 10000
+"""
+
+RESAMPLES = 10000
+JOINT_RESAMPLES = 1000  # full-recipe resamples: a standard error of at most 1.6 points
+CONFIDENCE = 0.95
+BINCOUNT_DRAWS = 1 << 15  # recipes drawn per index matrix: few enough that bincount's bins stay in cache
+MATMUL_ROWS = 256  # resamples per matrix product
+
+def consensus_settings(frame):
+    """The consensus settings of a RecipeFrame, as analyze_trends picks them: name -> values (missing = None/NaN)."""
+    settings = {
+        "film_simulation": frame["film_simulation"].astype(object).replace("", None),
+        "dynamic_range": frame["dynamic_range"].astype(object).map(clean_dr, na_action="ignore"),
+    }
+    for metric in TONE_FIELDS:
+        settings[metric] = frame[TONE_COLUMNS[metric]]
+    settings["wb_shift_red"] = frame["wb_shift_red"]
+    settings["wb_shift_blue"] = frame["wb_shift_blue"]
+    return settings
+
+def encode(values):
+    """Sorted distinct values (missing left out) and each row's code into them, -1 if missing."""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object).where(pd.notna(values), None), sort=True)
+    return list(uniques), codes.astype(np.int64)
+
+def setting_resamples(codes, size, resamples=RESAMPLES, rng=None):
+    """
+    Value counts of one setting (codes into `size` values, -1 if missing) in
+    every resample: (resamples, size + 1), the last column counting missing values.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    observed = np.bincount(np.where(codes < 0, size, codes), minlength=size + 1)
+    return rng.multinomial(len(codes), observed / max(1, len(codes)), size=resamples)
+
+def resample_counts(codes, sizes, resamples=JOINT_RESAMPLES, rng=None):
+    """
+    Value counts of every setting in every resample: codes is (settings, n),
+    sizes the number of distinct values per setting. Returns (counts, offsets)
+    where counts[:, offsets[s]:offsets[s] + sizes[s]] are setting s's counts
+    (the slot after them counts its missing values).
+    """
+    n_settings, n = codes.shape
+    offsets = np.concatenate([[0], np.cumsum(np.asarray(sizes) + 1)])
+    onehot = np.zeros((n, offsets[-1]), dtype=np.float32)
+    for s in range(n_settings):
+        slot = np.where(codes[s] < 0, sizes[s], codes[s])
+        onehot[np.arange(n), offsets[s] + slot] = 1.0
+
+    rng = rng if rng is not None else np.random.default_rng()
+    counts = np.empty((resamples, offsets[-1]), dtype=np.float32)
+    drawn = np.empty((min(MATMUL_ROWS, resamples), n), dtype=np.float32)
+    step = max(1, BINCOUNT_DRAWS // max(1, n))
+    for start in range(0, resamples, MATMUL_ROWS):
+        rows = min(MATMUL_ROWS, resamples - start)
+        for i in range(0, rows, step):
+            m = min(step, rows - i)
+            # Row b: the n recipes drawn for one resample, offset so each row bins separately
+            idx = rng.integers(0, n, (m, n)) if n else np.zeros((m, 0), dtype=np.int64)
+            idx += np.arange(m)[:, None] * n
+            drawn[i:i + m] = np.bincount(idx.ravel(), minlength=m * n).reshape(m, n)
+        counts[start:start + rows] = drawn[:rows] @ onehot
+    return counts, offsets
+
+def _modes(counts):
+    # argmax picks the first maximum, i.e. the lowest value: the same tie-break as the consensus
+    modes = np.argmax(counts, axis=1)
+    return np.where(counts.max(axis=1) > 0, modes, -1)
+
+def bootstrap_consensus(settings, resamples=RESAMPLES, confidence=CONFIDENCE, seed=0, joint_resamples=JOINT_RESAMPLES):
+    """
+    Bootstrap stability of the consensus (mode) of each setting in `settings`
+    (name -> values) and of the full recipe (over min(resamples, joint_resamples)). Returns
+    {"settings": {name: {mode, probability, share, ci, runner_up, runner_up_probability}},
+     "recipe": {probability, runner_up, runner_up_probability}, "resamples", "joint_resamples", "recipes"}.
+    """
+    names = list(settings)
+    encoded = [encode(settings[name]) for name in names]
+    sizes = [len(values) for values, _ in encoded]
+    n = len(encoded[0][1]) if encoded else 0
+    codes = np.vstack([c for _, c in encoded]) if encoded else np.zeros((0, 0), dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    tail = (1 - confidence) / 2
+
+    report = {}
+    point_modes = np.full(len(names), -1)
+    for s, name in enumerate(names):
+        values, setting_codes = encoded[s]
+        if not values:
+            report[name] = {"mode": None, "probability": None, "share": None, "ci": (None, None),
+                            "runner_up": None, "runner_up_probability": None}
+            continue
+        observed = np.bincount(setting_codes[setting_codes >= 0], minlength=sizes[s])
+        point = int(np.argmax(observed))
+        block = setting_resamples(setting_codes, sizes[s], resamples, rng)[:, :sizes[s]]
+        modes = _modes(block)
+        point_modes[s] = point
+
+        totals = block.sum(axis=1)
+        shares = np.divide(block[:, point], totals, out=np.zeros(resamples), where=totals > 0)
+        lo, hi = np.quantile(shares, [tail, 1 - tail]) if resamples else (np.nan, np.nan)
+
+        wins = np.bincount(modes[modes >= 0], minlength=sizes[s])
+        wins[point] = 0
+        if wins.any():
+            runner_up, runner_up_probability = int(np.argmax(wins)), wins.max() / resamples
+        else:
+            # Never the mode in any resample: fall back to the second most common value
+            others = observed.copy()
+            others[point] = -1
+            runner_up = int(np.argmax(others)) if sizes[s] > 1 else None
+            runner_up_probability = 0.0
+        report[name] = {
+            "mode": values[point],
+            "probability": float(np.mean(modes == point)),
+            "share": float(observed[point] / observed.sum()),
+            "ci": (float(lo), float(hi)),
+            "runner_up": None if runner_up is None else values[runner_up],
+            "runner_up_probability": float(runner_up_probability),
+        }
+
+    # Full recipe: every setting's mode at once, on resamples of whole recipes
+    joint = min(resamples, joint_resamples)
+    counts, offsets = resample_counts(codes, sizes, joint, rng)
+    resampled_modes = np.full((joint, len(names)), -1)
+    for s in range(len(names)):
+        if sizes[s]:
+            resampled_modes[:, s] = _modes(counts[:, offsets[s]:offsets[s] + sizes[s]])
+    matches = (resampled_modes == point_modes).all(axis=1)
+    recipe = {"probability": float(matches.mean()) if joint else None, "runner_up": None, "runner_up_probability": 0.0}
+    if (~matches).any():
+        alternatives, freq = np.unique(resampled_modes[~matches], axis=0, return_counts=True)
+        best = alternatives[np.argmax(freq)]
+        recipe["runner_up"] = {name: None if code < 0 else encoded[s][0][code]
+                               for s, (name, code) in enumerate(zip(names, best)) if code != point_modes[s]}
+        recipe["runner_up_probability"] = float(freq.max() / joint)
+    return {"settings": report, "recipe": recipe, "resamples": resamples, "joint_resamples": joint, "recipes": n}
+
+def format_report(result, confidence=CONFIDENCE):
+    pct = f"{confidence:.0%}"
+    lines = [f"Consensus stability ({result['resamples']:,} bootstrap resamples of {result['recipes']:,} recipes; "
+             f"full recipe: {result['joint_resamples']:,})",
+             f"{'setting':17} {'consensus':>16} {'P(mode)':>8} {'share':>6} {pct + ' CI':>13}   runner-up"]
+    for name, s in result["settings"].items():
+        if s["mode"] is None:
+            lines.append(f"{name:17} {'-':>16}")
+            continue
+        runner_up = "-" if s["runner_up"] is None else f"{s['runner_up']} ({s['runner_up_probability']:.1%})"
+        lines.append(f"{name:17} {str(s['mode']):>16} {s['probability']:>8.1%} {s['share']:>6.1%} "
+                     f"{s['ci'][0]:>6.1%}-{s['ci'][1]:<6.1%}   {runner_up}")
+    recipe = result["recipe"]
+    if recipe["probability"] is not None:
+        lines.append(f"Full recipe: every setting at its consensus value in {recipe['probability']:.1%} "
+                     f"of {result['joint_resamples']:,} resamples")
+    if recipe["runner_up"]:
+        changes = ", ".join(f"{k}={v}" for k, v in recipe["runner_up"].items())
+        lines.append(f"Runner-up recipe ({recipe['runner_up_probability']:.1%}): consensus with {changes}")
+    return "\n".join(lines)
+
+def _bench(recipes, resamples, joint_resamples=JOINT_RESAMPLES):
+    # Synthetic corpus shaped like the real settings: a few dominant values per setting
+    rng = np.random.default_rng(0)
+    settings = {}
+    for name, k in [("film_simulation", 20), ("dynamic_range", 3), *[(m, 9) for m in TONE_FIELDS],
+                    ("wb_shift_red", 19), ("wb_shift_blue", 19)]:
+        p = rng.dirichlet(np.ones(k))
+        settings[name] = rng.choice(k, recipes, p=p).astype(float)
+    start = time.perf_counter()
+    result = bootstrap_consensus(settings, resamples, joint_resamples=joint_resamples)
+    print(f"{recipes:,} recipes x {resamples:,} resamples (full recipe: {result['joint_resamples']:,}) "
+          f"in {time.perf_counter() - start:.3f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bootstrap confidence for the consensus (most common) settings")
+    parser.add_argument("--resamples", type=int, default=RESAMPLES)
+    parser.add_argument("--confidence", type=float, default=CONFIDENCE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--joint-resamples", type=int, default=JOINT_RESAMPLES,
+                        help=f"Resamples of whole recipes for the full-recipe line (default: {JOINT_RESAMPLES}, "
+                             "at most --resamples; each costs a pass over the corpus)")
+    parser.add_argument("--bench", type=int, metavar="N", help="Time --resamples resamples of N synthetic recipes instead")
+    add_db_argument(parser)
+    args = parser.parse_args()
+
+    if args.bench:
+        _bench(args.bench, args.resamples, args.joint_resamples)
+    else:
+        set_db_path(args.db)
+        init_db()
+        start = time.perf_counter()
+        frame = RecipeFrame.load().df
+        result = bootstrap_consensus(consensus_settings(frame), args.resamples, args.confidence, args.seed,
+                                     args.joint_resamples)
+        print(format_report(result, args.confidence))
+        print(f"({time.perf_counter() - start:.2f}s)")
@@ -1,15 +1,92 @@
+import os
+import re
 import sqlite3
 import json
-from typing import Optional, Dict, Any
+import time
+import hashlib
+from urllib.parse import quote
+from collections import namedtuple
+from typing import Optional, Dict, Any, Tuple, List
+from setting_values import NUMERIC_COLUMNS, TONE_COLUMNS, numeric_settings
 
-DB_PATH = "film_recipes.db"
+# Every script finds the database the same way: --db on the command line,
+# else $FUJISIMS_DB, else film_recipes.db in the current directory.
+DB_PATH_ENV = "FUJISIMS_DB"
+DB_PATH = os.environ.get(DB_PATH_ENV, "film_recipes.db")
 
-def get_connection():
-    return sqlite3.connect(DB_PATH)
+# Applied to every connection. WAL lets readers run while the scraper writes;
+# synchronous=NORMAL is durable across app crashes in WAL mode (only an OS
+# crash can lose the last commit). mmap and a 64 MB page cache keep the
+# analytics scans out of read() calls, and sorts/temp B-trees stay in RAM.
+CONNECTION_PRAGMAS = [
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+]
+
+def set_db_path(path: Optional[str]):
+    """Points every later connection at `path` (no-op for None, so it can take args.db directly)."""
+    global DB_PATH
+    if path:
+        DB_PATH = path
+
+def add_db_argument(parser):
+    """Adds the shared --db option to a script's ArgumentParser."""
+    parser.add_argument("--db", default=None,
+                        help=f"SQLite database path (default: ${DB_PATH_ENV} or film_recipes.db)")
+
+def connect(path: Optional[str] = None, readonly: bool = False) -> sqlite3.Connection:
+    """
+    Opens a tuned connection. readonly=True opens the file through a
+    mode=ro URI: it can never write, and fails instead of creating an empty
+    database when the path is wrong.
+    """
+    path = path or DB_PATH
+    if readonly:
+        conn = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True)
+    else:
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=WAL")  # persistent, stored in the file
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def get_connection(readonly: bool = False) -> sqlite3.Connection:
+    return connect(readonly=readonly)
 
 def init_db():
+    """Creates film_recipes.db or brings an existing one up to date (migrations + indexes)."""
     conn = get_connection()
-    cursor = conn.cursor()
+    try:
+        migrate(conn)
+        with conn:
+            cursor = conn.cursor()
+            ensure_recipe_indexes(cursor)
+            for key in PROMOTED_SETTINGS:
+                promote_setting(cursor, key)
+    finally:
+        conn.close()
+
+# ---------------------------------------------------------------------------
+# Schema migrations
+#
+# Every schema change is a numbered migration. migrate() applies the ones a
+# database hasn't seen yet, in order, and records each in schema_version, so
+# an old film_recipes.db is upgraded in place instead of being re-scraped.
+#
+# - Append new migrations; never edit or renumber one that has shipped.
+# - apply(cursor) runs in one transaction and must be idempotent (IF NOT
+#   EXISTS, _add_column_if_missing): databases from before schema_version
+#   existed replay every step over tables they may already have.
+# - backfill(conn), if any, runs after apply has committed, in batches (see
+#   backfill_in_batches), and the version is only recorded once it finishes.
+#   An interrupted backfill simply runs again next time.
+# ---------------------------------------------------------------------------
+Migration = namedtuple("Migration", ["version", "description", "apply", "backfill"])
+
+def _create_recipes(cursor):
     cursor.execute("""
         -- Main Recipe Table
         -- We store standard fields as columns for fast SQL querying (analytics).
@@ -37,59 +114,706 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     """)
+
+def _create_http_validators(cursor):
+    cursor.execute("""
+        -- HTTP cache validators per URL, so re-crawls can send conditional GETs
+        -- (If-None-Match / If-Modified-Since) and skip pages that haven't changed.
+        CREATE TABLE IF NOT EXISTS http_validators (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def _create_crawl_frontier(cursor):
+    cursor.execute("""
+        -- Crawl frontier + failure ledger. One row per discovered recipe URL, so a
+        -- killed crawl resumes where it stopped and failures are retried with backoff.
+        CREATE TABLE IF NOT EXISTS crawl_frontier (
+            url TEXT PRIMARY KEY,
+            sensor TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',  -- pending | done | failed
+            attempts INTEGER NOT NULL DEFAULT 0,     -- consecutive failures
+            last_error TEXT,
+            next_eligible_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMP,
+            discovered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_frontier_status ON crawl_frontier (status, next_eligible_at)")
+
+def _add_frontier_source(cursor):
+    # sources.py adapter name; frontiers from before adapters only ever held fujixweekly URLs
+    _add_column_if_missing(cursor, "crawl_frontier", "source", "TEXT NOT NULL DEFAULT 'fujixweekly'")
+
+def _add_typed_settings(cursor):
+    # Typed copies of the text settings, parsed at write time (setting_values.py)
+    for column, decl in NUMERIC_COLUMNS.items():
+        _add_column_if_missing(cursor, "recipes", column, decl)
+
+def _backfill_typed_settings(conn):
+    backfill_numeric_settings(conn=conn)
+
+def _add_recipe_revisions(cursor):
+    _add_column_if_missing(cursor, "recipes", "content_hash", "TEXT")
+    cursor.execute("""
+        -- One row per version of a recipe: its first save, then every save that
+        -- changed its content. Unchanged re-crawls don't touch recipes at all
+        -- (see RECIPE_UPSERT_SQL), so they add nothing here either.
+        CREATE TABLE IF NOT EXISTS recipe_revisions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipe_id INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            settings TEXT NOT NULL,  -- JSON object of CONTENT_FIELDS
+            recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_revisions_recipe ON recipe_revisions (recipe_id, id)")
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS recipes_revision_insert AFTER INSERT ON recipes
+        WHEN NEW.content_hash IS NOT NULL
+        BEGIN
+            INSERT INTO recipe_revisions (recipe_id, url, content_hash, settings)
+            VALUES (NEW.id, NEW.url, NEW.content_hash, {_revision_json("NEW")});
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS recipes_revision_update AFTER UPDATE OF content_hash ON recipes
+        WHEN OLD.content_hash IS NOT NULL AND OLD.content_hash IS NOT NEW.content_hash
+        BEGIN
+            INSERT INTO recipe_revisions (recipe_id, url, content_hash, settings)
+            VALUES (NEW.id, NEW.url, NEW.content_hash, {_revision_json("NEW")});
+        END
+    """)
+
+def _revision_json(alias: str) -> str:
+    # full_settings is nested as JSON rather than kept as an escaped string
+    pairs = [f"'{f}', {alias}.{f}" for f in CONTENT_FIELDS if f != "full_settings"]
+    pairs.append(f"'full_settings', CASE WHEN json_valid({alias}.full_settings) "
+                 f"THEN json({alias}.full_settings) ELSE {alias}.full_settings END")
+    return f"json_object({', '.join(pairs)})"
+
+def _backfill_recipe_revisions(conn):
+    backfill_in_batches(conn, "recipes", CONTENT_FIELDS, lambda row: {"content_hash": content_hash(row)})
+    # Rows saved before this migration get their current content as a first revision
+    with conn:
+        added = conn.execute(f"""
+            INSERT INTO recipe_revisions (recipe_id, url, content_hash, settings, recorded_at)
+            SELECT id, url, content_hash, {_revision_json("recipes")}, created_at FROM recipes
+            WHERE content_hash IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM recipe_revisions r WHERE r.recipe_id = recipes.id)
+        """).rowcount
+    print(f"Hashed existing recipes and recorded {added} baseline revisions.")
+
+# recipes columns in the full-text index, in recipes_fts column order
+FTS_COLUMNS = ["name", "sensor", "film_simulation", "grain_effect", "white_balance", "full_settings"]
+
+def _create_recipes_fts(cursor):
+    cols = ", ".join(FTS_COLUMNS)
+    new = ", ".join(f"NEW.{c}" for c in FTS_COLUMNS)
+    old = ", ".join(f"OLD.{c}" for c in FTS_COLUMNS)
+    # External-content FTS5 index: the text lives only in recipes, recipes_fts
+    # holds the inverted index. prefix='2 3' makes short prefix queries (port*)
+    # index lookups instead of term scans. See search.py.
+    cursor.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(
+            {cols}, content='recipes', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS recipes_fts_insert AFTER INSERT ON recipes BEGIN
+            INSERT INTO recipes_fts (rowid, {cols}) VALUES (NEW.id, {new});
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS recipes_fts_delete AFTER DELETE ON recipes BEGIN
+            INSERT INTO recipes_fts (recipes_fts, rowid, {cols}) VALUES ('delete', OLD.id, {old});
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS recipes_fts_update AFTER UPDATE OF {cols} ON recipes BEGIN
+            INSERT INTO recipes_fts (recipes_fts, rowid, {cols}) VALUES ('delete', OLD.id, {old});
+            INSERT INTO recipes_fts (rowid, {cols}) VALUES (NEW.id, {new});
+        END
+    """)
+
+def _build_recipes_fts(conn):
+    with conn:
+        conn.execute("INSERT INTO recipes_fts (recipes_fts) VALUES ('rebuild')")
+
+# recipes columns with a live value -> count table (recipe_counts). The tone
+# settings use their typed columns, so a mode is a number. The (red, blue)
+# white balance cell has its own table, wb_shift_counts.
+COUNT_DIMENSIONS = ["film_simulation", "dynamic_range", "grain_effect", "sensor",
+                    *TONE_COLUMNS.values(), "wb_shift_red", "wb_shift_blue"]
+
+def _count_sql(column: str, row: str, delta: int, when: str = "1") -> str:
+    value = f"{row}.{column}"
+    if delta > 0:
+        return f"""
+            INSERT INTO recipe_counts (dimension, value, count) SELECT '{column}', {value}, 1
+            WHERE {value} IS NOT NULL AND {when}
+            ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1;"""
+    return f"""
+            UPDATE recipe_counts SET count = count - 1 WHERE dimension = '{column}' AND value = {value} AND {when};
+            DELETE FROM recipe_counts WHERE dimension = '{column}' AND value = {value} AND count <= 0;"""
+
+def _wb_count_sql(row: str, delta: int, when: str = "1") -> str:
+    red, blue = f"{row}.wb_shift_red", f"{row}.wb_shift_blue"
+    if delta > 0:
+        return f"""
+            INSERT INTO wb_shift_counts (red, blue, count) SELECT {red}, {blue}, 1
+            WHERE {red} IS NOT NULL AND {blue} IS NOT NULL AND {when}
+            ON CONFLICT (red, blue) DO UPDATE SET count = count + 1;"""
+    return f"""
+            UPDATE wb_shift_counts SET count = count - 1 WHERE red = {red} AND blue = {blue} AND {when};
+            DELETE FROM wb_shift_counts WHERE red = {red} AND blue = {blue} AND count <= 0;"""
+
+def _create_recipe_counts(cursor):
+    cursor.execute("""
+        -- Live GROUP BY counts for the dashboard charts and consensus modes.
+        -- Triggers on recipes keep them exact, so reading a histogram costs
+        -- O(distinct values) instead of a pass over every recipe.
+        CREATE TABLE IF NOT EXISTS recipe_counts (
+            dimension TEXT NOT NULL,  -- a COUNT_DIMENSIONS column
+            value NOT NULL,           -- that column's value (NULLs aren't counted)
+            count INTEGER NOT NULL,
+            PRIMARY KEY (dimension, value)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS wb_shift_counts (
+            red INTEGER NOT NULL,
+            blue INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (red, blue)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS recipes_counts_insert AFTER INSERT ON recipes BEGIN
+            {"".join(_count_sql(c, "NEW", 1) for c in COUNT_DIMENSIONS)}
+            {_wb_count_sql("NEW", 1)}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS recipes_counts_delete AFTER DELETE ON recipes BEGIN
+            {"".join(_count_sql(c, "OLD", -1) for c in COUNT_DIMENSIONS)}
+            {_wb_count_sql("OLD", -1)}
+        END
+    """)
+    # An update moves the row from its old value's count to its new one, for
+    # the columns that actually changed
+    moves = []
+    for c in COUNT_DIMENSIONS:
+        changed = f"OLD.{c} IS NOT NEW.{c}"
+        moves.append(_count_sql(c, "OLD", -1, changed) + _count_sql(c, "NEW", 1, changed))
+    wb_changed = "(OLD.wb_shift_red IS NOT NEW.wb_shift_red OR OLD.wb_shift_blue IS NOT NEW.wb_shift_blue)"
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS recipes_counts_update AFTER UPDATE OF {", ".join(COUNT_DIMENSIONS)} ON recipes BEGIN
+            {"".join(moves)}
+            {_wb_count_sql("OLD", -1, wb_changed)}
+            {_wb_count_sql("NEW", 1, wb_changed)}
+        END
+    """)
+
+def rebuild_recipe_counts(conn):
+    """Recomputes recipe_counts / wb_shift_counts from scratch (one transaction)."""
+    with conn:
+        conn.execute("DELETE FROM recipe_counts")
+        conn.execute("DELETE FROM wb_shift_counts")
+        for c in COUNT_DIMENSIONS:
+            conn.execute(f"""
+                INSERT INTO recipe_counts (dimension, value, count)
+                SELECT '{c}', {c}, COUNT(*) FROM recipes WHERE {c} IS NOT NULL GROUP BY {c}
+            """)
+        conn.execute("""
+            INSERT INTO wb_shift_counts (red, blue, count)
+            SELECT wb_shift_red, wb_shift_blue, COUNT(*) FROM recipes
+            WHERE wb_shift_red IS NOT NULL AND wb_shift_blue IS NOT NULL
+            GROUP BY wb_shift_red, wb_shift_blue
+        """)
+
+def value_counts(conn, dimension: str, limit: Optional[int] = None) -> List[Tuple[Any, int]]:
+    """(value, count) pairs of a COUNT_DIMENSIONS column, most common first (ties: lowest value first)."""
+    if dimension not in COUNT_DIMENSIONS:
+        raise ValueError(f"{dimension!r} isn't counted (see COUNT_DIMENSIONS)")
+    sql = "SELECT value, count FROM recipe_counts WHERE dimension = ? ORDER BY count DESC, value"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    return conn.execute(sql, (dimension,)).fetchall()
+
+def setting_mode(conn, dimension: str):
+    """Most common value of a counted column, with pandas' mode()[0] tie-break; None if there are none."""
+    top = value_counts(conn, dimension, limit=1)
+    return top[0][0] if top else None
+
+MIGRATIONS = [
+    Migration(1, "recipes table", _create_recipes, None),
+    Migration(2, "http_validators table", _create_http_validators, None),
+    Migration(3, "crawl_frontier table", _create_crawl_frontier, None),
+    Migration(4, "crawl_frontier.source", _add_frontier_source, None),
+    Migration(5, "typed setting columns", _add_typed_settings, _backfill_typed_settings),
+    Migration(6, "content hash + recipe_revisions", _add_recipe_revisions, _backfill_recipe_revisions),
+    Migration(7, "recipes_fts full-text index", _create_recipes_fts, _build_recipes_fts),
+    Migration(8, "recipe_counts + wb_shift_counts", _create_recipe_counts, rebuild_recipe_counts),
+]
+
+def schema_version(conn) -> int:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+def migrate(conn, verbose: bool = True) -> int:
+    """
+    Applies every pending migration in order. Returns the schema version reached.
+
+    Several scripts may call this at once (say scrape.py mid-crawl and
+    analyze_trends.py), so each step re-reads schema_version under the
+    write lock and is skipped if another process got there first. A step
+    without a backfill records its version in the same transaction as its
+    DDL; one with a backfill records it once the backfill is done (INSERT OR
+    IGNORE: two processes may both have backfilled, which is harmless).
+    """
+    current = schema_version(conn)
     conn.commit()
+    record_sql = "INSERT OR IGNORE INTO schema_version (version, description) VALUES (?, ?)"
+    for migration in MIGRATIONS:
+        if migration.version <= current:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+            if migration.version <= current:
+                conn.rollback()
+                continue
+            migration.apply(conn.cursor())
+            if not migration.backfill:
+                conn.execute(record_sql, (migration.version, migration.description))
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+        if migration.backfill:
+            migration.backfill(conn)
+            with conn:
+                conn.execute(record_sql, (migration.version, migration.description))
+        current = migration.version
+        if verbose:
+            print(f"Schema migrated to version {current}: {migration.description}")
+    return current
+
+def backfill_in_batches(conn, table: str, columns: list, compute, batch_size: int = 1000) -> int:
+    """
+    Rewrites rows of `table` in rowid order, `batch_size` rows at a time.
+    compute({column: value}) returns {column: new value} for the row (any
+    columns; it may read different ones than it writes).
+
+    Each batch is its own short transaction, so readers and the scraper's
+    RecipeWriter get the database back between batches, and only one batch
+    is ever held in memory. Re-running is harmless. Returns rows visited.
+    """
+    select_sql = f"SELECT rowid, {', '.join(columns)} FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?"
+    update_sql = None
+    visited = 0
+    last_rowid = 0
+    while True:
+        rows = conn.execute(select_sql, (last_rowid, batch_size)).fetchall()
+        if not rows:
+            break
+        updates = [(compute(dict(zip(columns, row[1:]))), row[0]) for row in rows]
+        if update_sql is None:
+            targets = list(updates[0][0])
+            update_sql = f"UPDATE {table} SET {', '.join(f'{c} = ?' for c in targets)} WHERE rowid = ?"
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(update_sql, [[values[c] for c in targets] + [rowid] for values, rowid in updates])
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        visited += len(rows)
+        last_rowid = rows[-1][0]
+    return visited
+
+NUMERIC_SOURCE_FIELDS = ["dynamic_range", "grain_effect", "highlight", "shadow", "color", "sharpness",
+                         "noise_reduction", "clarity", "iso", "exposure_compensation", "full_settings"]
+
+def backfill_numeric_settings(chunk_size: int = 1000, db_path: Optional[str] = None, conn=None) -> int:
+    """
+    Recomputes the typed setting columns for every existing row (e.g. after
+    changing setting_values.py). Returns the number of rows updated.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = connect(db_path)
+    try:
+        updated = backfill_in_batches(conn, "recipes", NUMERIC_SOURCE_FIELDS, numeric_settings, chunk_size)
+    finally:
+        if own_conn:
+            conn.close()
+    print(f"Backfilled typed setting columns for {updated} recipes.")
+    return updated
+
+# Indexes for the analytics queries in analyze_trends.py and query_examples.py
+# (see bench_queries.py). Each GROUP BY column gets its own index, so the
+# GROUP BY reads a small covering index in order instead of the whole table.
+# The two-column ones also cover the columns those queries read next to the
+# filter. init_db() creates what's missing and drops any idx_recipes_* index
+# no longer listed here, so this dict is the whole index set.
+RECIPE_INDEX_PREFIX = "idx_recipes_"
+RECIPE_INDEXES = {
+    "idx_recipes_film_simulation": ["film_simulation"],
+    "idx_recipes_dynamic_range": ["dynamic_range"],
+    "idx_recipes_grain_effect": ["grain_effect"],
+    "idx_recipes_sensor": ["sensor"],
+    "idx_recipes_wb_shift": ["wb_shift_red", "wb_shift_blue"],
+    "idx_recipes_noise_reduction": ["noise_reduction"],
+    "idx_recipes_iso_max": ["iso_max", "iso"],
+}
+
+def ensure_recipe_indexes(cursor) -> Tuple[list, list]:
+    """Brings the idx_recipes_* indexes in line with RECIPE_INDEXES. Returns (created, dropped)."""
+    existing = {row[0] for row in cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'recipes' AND name LIKE ?",
+        (RECIPE_INDEX_PREFIX + "%",))}
+    dropped = sorted(existing - set(RECIPE_INDEXES))
+    for name in dropped:
+        cursor.execute(f"DROP INDEX {name}")
+    created = [name for name in RECIPE_INDEXES if name not in existing]
+    for name in created:
+        cursor.execute(f"CREATE INDEX {name} ON recipes ({', '.join(RECIPE_INDEXES[name])})")
+    if created:
+        # Give the planner fresh statistics for the new indexes
+        cursor.execute("ANALYZE recipes")
+    return created, dropped
+
+# full_settings keys exposed as indexed columns. Each becomes a VIRTUAL
+# generated column (json_extract on full_settings) plus an index, so e.g.
+#   WHERE fs_color_chrome_effect = 'Strong' AND color_value >= 2
+# is an index lookup instead of json.loads over every row. Nothing is
+# rewritten: SQLite computes the value on read and keeps the index current.
+# Add a key here to promote it on the next init_db(), or run
+#   python scripts/database.py --promote "Some Key"
+PROMOTED_SETTINGS = ["Color Chrome Effect", "Color Chrome FX Blue"]
+
+def setting_column(key: str) -> str:
+    """Column name for a full_settings key: "Color Chrome Effect" -> fs_color_chrome_effect."""
+    slug = re.sub(r'[^a-z0-9]+', '_', key.lower()).strip('_')
+    if not slug:
+        raise ValueError(f"Can't make a column name from setting key {key!r}")
+    return f"fs_{slug}"
+
+def promote_setting(cursor, key: str) -> str:
+    """Adds the generated column + index for a full_settings key (if missing). Returns the column name."""
+    if '"' in key:
+        raise ValueError(f"Setting keys with double quotes can't be promoted: {key!r}")
+    column = setting_column(key)
+    index = f"idx_settings_{column[3:]}"
+    path = '$."' + key.replace("'", "''") + '"'
+    table_sql = cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'recipes'").fetchone()[0]
+    if f"{column} TEXT GENERATED ALWAYS AS (json_extract(" in table_sql:
+        # Promoted before the json_valid guard: redefine it (the index has to go first)
+        cursor.execute(f"DROP INDEX IF EXISTS {index}")
+        cursor.execute(f"ALTER TABLE recipes DROP COLUMN {column}")
+    # json_extract raises "malformed JSON" on a non-JSON full_settings, which would
+    # fail CREATE INDEX and every write of such a row; those rows get NULL instead
+    _add_column_if_missing(cursor, "recipes", column,
+                           f"TEXT GENERATED ALWAYS AS (CASE WHEN json_valid(full_settings) "
+                           f"THEN json_extract(full_settings, '{path}') END) VIRTUAL")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {index} ON recipes ({column})")
+    return column
+
+def _add_column_if_missing(cursor, table: str, column: str, decl: str) -> bool:
+    # CREATE TABLE IF NOT EXISTS never alters an existing table, so new columns need this.
+    # (table_xinfo rather than table_info, which leaves out generated columns)
+    existing = {row[1] for row in cursor.execute(f"PRAGMA table_xinfo({table})")}
+    if column not in existing:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+        return True
+    return False
+
+# Frontier defaults: re-check a finished page once a day, retry failures
+# after 1 min, 2 min, 4 min ... capped at 6 hours, and give up after 5 tries.
+FRESHNESS_SECONDS = 24 * 3600
+BACKOFF_BASE_SECONDS = 60
+BACKOFF_MAX_SECONDS = 6 * 3600
+MAX_ATTEMPTS = 5
+
+def add_to_frontier(links):
+    """links: iterable of (url, sensor, source). Already-known URLs keep their status."""
+    conn = get_connection()
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO crawl_frontier (url, sensor, source) VALUES (?, ?, ?)", links)
     conn.close()
 
-def save_recipe(data: Dict[str, Any]):
+def claim_frontier(sources, freshness_seconds: int = FRESHNESS_SECONDS, max_attempts: int = MAX_ATTEMPTS):
+    """
+    Returns [(url, sensor, source, attempts)] for the given sources that are due: never
+    fetched, failed and past their backoff (with tries left), or done but
+    older than the freshness window.
+    """
     conn = get_connection()
-    cursor = conn.cursor()
-    
+    placeholders = ", ".join(["?"] * len(sources))
+    rows = conn.execute(f"""
+        SELECT url, sensor, source, attempts FROM crawl_frontier
+        WHERE source IN ({placeholders})
+          AND ((status = 'pending' AND next_eligible_at <= CURRENT_TIMESTAMP)
+            OR (status = 'failed' AND attempts < ? AND next_eligible_at <= CURRENT_TIMESTAMP)
+            OR (status = 'done' AND completed_at <= datetime('now', ?)))
+        ORDER BY next_eligible_at, url
+    """, (*sources, max_attempts, f"-{int(freshness_seconds)} seconds")).fetchall()
+    conn.close()
+    return rows
+
+def frontier_summary() -> Dict[str, int]:
+    conn = get_connection()
+    rows = conn.execute("SELECT status, COUNT(*) FROM crawl_frontier GROUP BY status").fetchall()
+    conn.close()
+    return dict(rows)
+
+def load_http_validators() -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+    """Returns {url: (etag, last_modified)} for every page we have validators for."""
+    conn = get_connection()
+    rows = conn.execute("SELECT url, etag, last_modified FROM http_validators").fetchall()
+    conn.close()
+    return {url: (etag, last_modified) for url, etag, last_modified in rows}
+
+VALIDATORS_UPSERT_SQL = """
+    INSERT INTO http_validators (url, etag, last_modified, checked_at)
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(url) DO UPDATE SET
+        etag=excluded.etag,
+        last_modified=excluded.last_modified,
+        checked_at=excluded.checked_at
+"""
+
+FRONTIER_DONE_SQL = """
+    UPDATE crawl_frontier
+    SET status='done', attempts=0, last_error=NULL,
+        completed_at=CURRENT_TIMESTAMP, next_eligible_at=CURRENT_TIMESTAMP
+    WHERE url=?
+"""
+
+# Exponential backoff: base * 2^attempts seconds (attempts = failures so far), capped.
+FRONTIER_FAILED_SQL = f"""
+    UPDATE crawl_frontier
+    SET status='failed', attempts=attempts + 1, last_error=?,
+        next_eligible_at=datetime('now', '+' || MIN({BACKOFF_BASE_SECONDS} * (1 << attempts), {BACKOFF_MAX_SECONDS}) || ' seconds')
+    WHERE url=?
+"""
+
+# Everything a recipe page says about a recipe. content_hash covers exactly
+# these; url is the key, and the typed columns are derived from them.
+CONTENT_FIELDS = [
+    "name", "sensor", "film_simulation", "dynamic_range", 
+    "grain_effect", "white_balance", "highlight", "shadow", "color", 
+    "sharpness", "noise_reduction", "clarity", "iso", 
+    "exposure_compensation", "wb_shift_red", "wb_shift_blue", "full_settings",
+]
+
+RECIPE_FIELDS = ["url", *CONTENT_FIELDS, *NUMERIC_COLUMNS, "content_hash"]
+
+RECIPE_UPSERT_SQL = f"""
+    INSERT INTO recipes ({", ".join(RECIPE_FIELDS)}) 
+    VALUES ({", ".join(["?"] * len(RECIPE_FIELDS))})
+    ON CONFLICT(url) DO UPDATE SET
+        name=excluded.name,
+        sensor=excluded.sensor,
+        film_simulation=excluded.film_simulation,
+        dynamic_range=excluded.dynamic_range,
+        grain_effect=excluded.grain_effect,
+        white_balance=excluded.white_balance,
+        highlight=excluded.highlight,
+        shadow=excluded.shadow,
+        color=excluded.color,
+        sharpness=excluded.sharpness,
+        noise_reduction=excluded.noise_reduction,
+        clarity=excluded.clarity,
+        iso=excluded.iso,
+        exposure_compensation=excluded.exposure_compensation,
+        wb_shift_red=excluded.wb_shift_red,
+        wb_shift_blue=excluded.wb_shift_blue,
+        full_settings=excluded.full_settings,
+        highlight_value=excluded.highlight_value,
+        shadow_value=excluded.shadow_value,
+        color_value=excluded.color_value,
+        sharpness_value=excluded.sharpness_value,
+        noise_reduction_value=excluded.noise_reduction_value,
+        clarity_value=excluded.clarity_value,
+        exposure_compensation_value=excluded.exposure_compensation_value,
+        dr_value=excluded.dr_value,
+        iso_max=excluded.iso_max,
+        grain_strength=excluded.grain_strength,
+        grain_size=excluded.grain_size,
+        chrome_effect=excluded.chrome_effect,
+        chrome_fx_blue=excluded.chrome_fx_blue,
+        content_hash=excluded.content_hash
+    -- Unchanged recipe: no write at all (no new row version, nothing in the WAL)
+    WHERE recipes.content_hash IS NOT excluded.content_hash
+"""
+
+def content_hash(data: Dict[str, Any]) -> str:
+    """sha256 of a recipe's CONTENT_FIELDS (full_settings as its stored JSON string)."""
+    payload = json.dumps([data.get(f) for f in CONTENT_FIELDS], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _recipe_values(data: Dict[str, Any]) -> list:
+    # Typed setting columns are always derived from the text, never taken from the caller
+    data.update(numeric_settings(data))
+
     # Serialize full_settings to JSON if present
     if "full_settings" in data and isinstance(data["full_settings"], dict):
         data["full_settings"] = json.dumps(data["full_settings"])
+    data["content_hash"] = content_hash(data)
 
-    fields = [
-        "name", "sensor", "url", "film_simulation", "dynamic_range", 
-        "grain_effect", "white_balance", "highlight", "shadow", "color", 
-        "sharpness", "noise_reduction", "clarity", "iso", 
-        "exposure_compensation", "wb_shift_red", "wb_shift_blue", "full_settings"
-    ]
-    
     # Filter data to only include known fields
-    insert_data = {k: data.get(k) for k in fields}
-    
-    placeholders = ", ".join(["?"] * len(fields))
-    columns = ", ".join(fields)
-    
-    sql = f"""
-        INSERT INTO recipes ({columns}) 
-        VALUES ({placeholders})
-        ON CONFLICT(url) DO UPDATE SET
-            name=excluded.name,
-            sensor=excluded.sensor,
-            film_simulation=excluded.film_simulation,
-            dynamic_range=excluded.dynamic_range,
-            grain_effect=excluded.grain_effect,
-            white_balance=excluded.white_balance,
-            highlight=excluded.highlight,
-            shadow=excluded.shadow,
-            color=excluded.color,
-            sharpness=excluded.sharpness,
-            noise_reduction=excluded.noise_reduction,
-            clarity=excluded.clarity,
-            iso=excluded.iso,
-            exposure_compensation=excluded.exposure_compensation,
-            wb_shift_red=excluded.wb_shift_red,
-            wb_shift_blue=excluded.wb_shift_blue,
-            full_settings=excluded.full_settings
-    """
-    
-    values = [insert_data[f] for f in fields]
-    
-    cursor.execute(sql, values)
+    return [data.get(f) for f in RECIPE_FIELDS]
+
+def save_recipe(data: Dict[str, Any]):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(RECIPE_UPSERT_SQL, _recipe_values(data))
     conn.commit()
     conn.close()
 
+class RecipeWriter:
+    """
+    Bulk writer for the scraper (and any big synthetic load).
+
+    save_recipe() pays for a connection + fsync per row. RecipeWriter keeps one
+    connection open in WAL mode and buffers rows, flushing them with
+    executemany() in a single transaction every `batch_size` rows or
+    `flush_interval` seconds, whichever comes first.
+
+    HTTP validators (etag / last_modified on the recipe dict) are written in the
+    same transaction as their recipe, so a 304 on the next crawl never hides a
+    recipe that didn't make it to disk. crawl_frontier updates (mark_done /
+    mark_failed) ride along in the same batches.
+
+    Recipes whose content_hash matches the stored one are skipped by the
+    upsert itself; `changed` counts the ones that were new or different.
+
+        with RecipeWriter() as writer:
+            for recipe in recipes:
+                writer.add(recipe)
+    """
+    def __init__(self, db_path: Optional[str] = None, batch_size: int = 500,
+                 flush_interval: float = 2.0, verbose: bool = True, metrics=None):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.verbose = verbose
+        self.metrics = metrics  # anything with observe(stage, seconds), e.g. metrics.CrawlMetrics
+        self.conn = None
+        self.rows = []
+        self.validators = []
+        self.frontier_done = []
+        self.frontier_failed = []
+        self.written = 0
+        self.changed = 0
+
+    def open(self):
+        self.conn = connect(self.db_path)  # WAL + synchronous=NORMAL, see CONNECTION_PRAGMAS
+        self.started = time.perf_counter()
+        self.last_flush = self.started
+        return self
+
+    def add(self, data: Dict[str, Any]):
+        self.rows.append(_recipe_values(data))
+        if data.get("etag") or data.get("last_modified"):
+            self.validators.append((data["url"], data.get("etag"), data.get("last_modified")))
+        self._maybe_flush()
+
+    def mark_done(self, url: str):
+        """Marks a crawl_frontier URL as fetched (saved, or unchanged on a 304)."""
+        self.frontier_done.append((url,))
+        self._maybe_flush()
+
+    def mark_failed(self, url: str, error: str):
+        self.frontier_failed.append((error, url))
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        pending = len(self.rows) + len(self.frontier_done) + len(self.frontier_failed)
+        if pending >= self.batch_size or time.perf_counter() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self.rows or self.frontier_done or self.frontier_failed:
+            start = time.perf_counter()
+            with self.conn:  # one transaction per batch
+                if self.rows:
+                    self.changed += self.conn.executemany(RECIPE_UPSERT_SQL, self.rows).rowcount
+                if self.validators:
+                    self.conn.executemany(VALIDATORS_UPSERT_SQL, self.validators)
+                if self.frontier_done:
+                    self.conn.executemany(FRONTIER_DONE_SQL, self.frontier_done)
+                if self.frontier_failed:
+                    self.conn.executemany(FRONTIER_FAILED_SQL, self.frontier_failed)
+            if self.metrics:
+                self.metrics.observe("save", time.perf_counter() - start)
+            self.written += len(self.rows)
+            self.rows = []
+            self.validators = []
+            self.frontier_done = []
+            self.frontier_failed = []
+        self.last_flush = time.perf_counter()
+
+    def close(self):
+        if self.conn is None:
+            return
+        self.flush()
+        self.conn.close()
+        self.conn = None
+        elapsed = time.perf_counter() - self.started
+        if self.verbose:
+            rate = self.written / elapsed if elapsed > 0 else 0.0
+            print(f"RecipeWriter: wrote {self.written} recipes ({self.changed} new or changed) "
+                  f"in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Create film_recipes.db or migrate it to the current schema")
+    parser.add_argument("--backfill", action="store_true",
+                        help="Recompute the typed setting columns for every recipe (e.g. after changing setting_values.py)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--rebuild-counts", action="store_true",
+                        help="Recompute recipe_counts / wb_shift_counts from the recipes table")
+    parser.add_argument("--promote", action="append", default=[], metavar="KEY",
+                        help="Expose a full_settings key as an indexed generated column (repeatable)")
+    add_db_argument(parser)
+    args = parser.parse_args()
+    set_db_path(args.db)
     init_db()
-    print("Database initialized.")
+    conn = get_connection()
+    print(f"Database initialized (schema version {schema_version(conn)}).")
+    conn.close()
+    if args.backfill:
+        backfill_numeric_settings(args.chunk_size)
+    if args.rebuild_counts:
+        conn = get_connection()
+        rebuild_recipe_counts(conn)
+        conn.close()
+        print("Rebuilt recipe_counts and wb_shift_counts.")
+    if args.promote:
+        conn = get_connection()
+        with conn:
+            for key in args.promote:
+                print(f"Promoted {key!r} to column {promote_setting(conn.cursor(), key)}")
+        conn.close()
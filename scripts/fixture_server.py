@@ -0,0 +1,234 @@
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+"""
+Fixture Server
+--------------
+A local stand-in for fujixweekly.com, so the scraper can be tested and
+benchmarked without touching the network.
+
+It serves one index page per sensor and `pages` synthetic recipe pages in
+the same WordPress layout the parser expects (title, entry-content and a
+sidebar, comments and footer around them). Pages are generated from the
+page number and seed, so the same settings always give the same corpus.
+
+    python scripts/fixture_server.py --pages 1000 --latency-ms 50 --error-rate 0.01
+
+then point a source at it:
+
+    FujiXWeeklySource(server.index_urls(), host=server.host)
+
+Responses carry an ETag and honour If-None-Match, like the real site.
+"""
+DEFAULT_SENSORS = ["X-Trans V", "X-Trans IV"]
+
+FILM_SIMULATIONS = ["Classic Chrome", "Classic Negative", "Nostalgic Neg.", "Eterna", "Astia/Soft",
+                    "Provia/Standard", "Velvia/Vivid", "Pro Neg. High", "Acros", "Reala Ace"]
+DYNAMIC_RANGES = ["DR-Auto", "DR100", "DR200", "DR400"]
+GRAIN_EFFECTS = ["Off", "Weak, Small", "Weak, Large", "Strong, Small", "Strong, Large"]
+CHROME_EFFECTS = ["Off", "Weak", "Strong"]
+WHITE_BALANCES = ["Auto", "Daylight", "Shade", "Auto Ambience Priority", "5200K", "6500K", "Fluorescent 1"]
+ISO_LIMITS = [1600, 3200, 6400, 12800]
+EV_STEPS = ["-2/3", "-1/3", "0", "+1/3", "+2/3", "+1"]
+
+def _signed(value):
+    return f"+{value}" if value > 0 else str(value)
+
+def recipe_settings(i, seed=0):
+    """The settings shown on recipe page i, as (label, value) pairs."""
+    rng = random.Random(seed * 1_000_003 + i)
+    return [
+        ("Film Simulation", rng.choice(FILM_SIMULATIONS)),
+        ("Dynamic Range", rng.choice(DYNAMIC_RANGES)),
+        ("Grain Effect", rng.choice(GRAIN_EFFECTS)),
+        ("Color Chrome Effect", rng.choice(CHROME_EFFECTS)),
+        ("Color Chrome FX Blue", rng.choice(CHROME_EFFECTS)),
+        ("White Balance", f"{rng.choice(WHITE_BALANCES)}, {_signed(rng.randint(-4, 4))} Red & {_signed(rng.randint(-6, 4))} Blue"),
+        ("Highlight", _signed(rng.choice([-2, -1.5, -1, -0.5, 0, 0.5, 1, 2]))),
+        ("Shadow", _signed(rng.choice([-2, -1, -0.5, 0, 0.5, 1, 1.5, 2]))),
+        ("Color", _signed(rng.randint(-4, 4))),
+        ("Sharpness", _signed(rng.randint(-4, 2))),
+        ("Noise Reduction", _signed(rng.randint(-4, 0))),
+        ("Clarity", _signed(rng.randint(-5, 3))),
+        ("ISO", f"Auto, up to ISO {rng.choice(ISO_LIMITS)}"),
+        ("Exposure Compensation", f"{rng.choice(EV_STEPS)} to {rng.choice(EV_STEPS)} (typically)"),
+    ]
+
+class FixtureCorpus:
+    def __init__(self, pages=100, sensors=None, seed=0, base_url=""):
+        self.pages = pages
+        self.sensors = list(sensors or DEFAULT_SENSORS)
+        self.seed = seed
+        self.base_url = base_url
+
+    def slug(self, sensor):
+        return sensor.lower().replace(" ", "-") + "-recipes"
+
+    def index_path(self, sensor):
+        return f"/{self.slug(sensor)}/"
+
+    def recipe_path(self, i):
+        # Dated like a WordPress permalink, which is what _is_likely_recipe looks for
+        day = i % 28 + 1
+        month = i // 28 % 12 + 1
+        year = 2018 + i // 336 % 8
+        return f"/{year}/{month:02d}/{day:02d}/fixture-recipe-{i}/"
+
+    def sensor_pages(self, sensor):
+        """Recipe pages listed on a sensor's index (round-robin over the sensors)."""
+        k = self.sensors.index(sensor)
+        return range(k, self.pages, len(self.sensors))
+
+    def index_html(self, sensor):
+        links = "\n".join(
+            f'<p><a href="{self.base_url}{self.recipe_path(i)}">Fixture Recipe {i}</a></p>'
+            for i in self.sensor_pages(sensor)
+        )
+        return self._page(f"Fujifilm {sensor} Recipes", links)
+
+    def recipe_html(self, i):
+        rng = random.Random(self.seed * 1_000_003 + i + 1)
+        settings = "<br>\n".join(f"{label}: {value}" for label, value in recipe_settings(i, self.seed))
+        intro = " ".join(rng.choice(["film", "light", "colour", "warm", "shadow", "street", "grain", "sky"])
+                         for _ in range(120))
+        body = f"""<p>{intro}</p>
+<p><strong>{settings}</strong></p>
+<ul><li>Pairs well with: golden hour</li><li>Camera: X100V</li></ul>
+<p>Example photographs, all camera-made JPEGs using this recipe:</p>"""
+        return self._page(f"Fixture Recipe {i}", body)
+
+    def _page(self, title, content):
+        sidebar = "\n".join(f'<li><a href="{self.base_url}/category/c{n}/">Category {n}</a></li>' for n in range(40))
+        comments = "\n".join(
+            f'<li class="comment"><p>Comment {n}: lovely results, thanks for sharing.</p></li>' for n in range(15)
+        )
+        return f"""<!DOCTYPE html>
+<html><head><title>{title} | FUJI X WEEKLY</title>
+<script>var wp = {{"ajax": "/wp-admin/admin-ajax.php"}};</script></head>
+<body class="post-template-default single">
+<header><nav><ul>{sidebar}</ul></nav></header>
+<main><article>
+<h1 class="entry-title">{title}</h1>
+<div class="entry-content">
+{content}
+</div>
+</article>
+<ol class="comment-list">{comments}</ol></main>
+<aside id="secondary"><ul>{sidebar}</ul></aside>
+<footer><p>&copy; Fuji X Weekly</p></footer>
+</body></html>""".encode("utf-8")
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, a kept-alive
+    # connection waits for the client's delayed ACK (~40 ms) on every response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(max(0.0, server.latency + server.rng_uniform(-server.jitter, server.jitter)))
+
+        body = server.route(self.path)
+        if body is None:
+            return self._send(404, b"not found")
+        if server.rng_uniform(0, 1) < server.error_rate:
+            return self._send(500, b"fixture error")
+
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, None, etag)
+        self._send(200, body, etag)
+
+    def _send(self, status, body, etag=None):
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body) if body else 0))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, pages=100, sensors=None, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0,
+                 seed=0, host="127.0.0.1", port=0):
+        super().__init__((host, port), FixtureHandler)
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.corpus = FixtureCorpus(pages, sensors, seed, base_url=f"http://{self.host}")
+        self.indexes = {self.corpus.index_path(s): s for s in self.corpus.sensors}
+
+    @property
+    def host(self):
+        return f"{self.server_address[0]}:{self.server_address[1]}"
+
+    def index_urls(self):
+        """{sensor: index url}, ready for FujiXWeeklySource(index_urls=...)."""
+        return {sensor: f"http://{self.host}{path}" for path, sensor in self.indexes.items()}
+
+    def rng_uniform(self, a, b):
+        with self.rng_lock:
+            return self.rng.uniform(a, b)
+
+    def route(self, path):
+        path = path.split("?", 1)[0]
+        if path in self.indexes:
+            return self.corpus.index_html(self.indexes[path])
+        if path.startswith("/") and "/fixture-recipe-" in path:
+            try:
+                i = int(path.rstrip("/").rsplit("-", 1)[1])
+            except ValueError:
+                return None
+            if 0 <= i < self.corpus.pages and path == self.corpus.recipe_path(i):
+                return self.corpus.recipe_html(i)
+        return None
+
+    def start(self):
+        """Serves on a background thread and returns self."""
+        threading.Thread(target=self.serve_forever, name="fixture-server", daemon=True).start()
+        return self
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a synthetic fujixweekly-style site for offline scraper runs")
+    parser.add_argument("--pages", type=int, default=100, help="Number of recipe pages (default: 100)")
+    parser.add_argument("--sensors", default=",".join(DEFAULT_SENSORS),
+                        help="Comma-separated sensor names, one index page each")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added delay per response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random +/- spread on the delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of responses that are HTTP 500 (0-1)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+
+    if args.pages < 1:
+        parser.error("--pages must be at least 1")
+    if not 0 <= args.error_rate <= 1:
+        parser.error("--error-rate must be between 0 and 1")
+
+    server = FixtureServer(args.pages, args.sensors.split(","), args.latency_ms, args.jitter_ms,
+                           args.error_rate, args.seed, port=args.port)
+    print(f"Serving {args.pages} recipe pages on http://{server.host}/")
+    for sensor, url in server.index_urls().items():
+        print(f"  {sensor}: {url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
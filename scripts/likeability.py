@@ -0,0 +1,217 @@
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import database
+from database import init_db, set_db_path, add_db_argument, setting_mode, value_counts
+from setting_values import TONE_FIELDS, TONE_COLUMNS
+from recipe_frame import RecipeFrame
+
+"""
+Likeability Scoring
+-------------------
+The "Likeability Index" of a recipe is how many of its settings agree with a
+target recipe (usually the community consensus). Each matching setting adds
+its weight, so with the default weight of 1 for all 10 settings a recipe
+scores 0-10:
+
+    film_simulation, dynamic_range          exact text match
+    highlight ... clarity (6 tone settings) typed value (*_value) match
+    wb_shift_red, wb_shift_blue             WB shift match
+
+The corpus is encoded once as a (10, N) float matrix: text settings become
+category codes, and NULL becomes NaN, which matches nothing. Scoring a batch
+of targets takes one broadcast comparison per setting over a
+(targets x recipes) block. Matches are counted in uint8 for each group of
+settings that share a weight, and the weights are applied once per group.
+top_k() ranks thousands of what-if targets against the whole corpus in one
+call.
+
+    python scripts/likeability.py -k 5
+    python scripts/likeability.py --weights film_simulation=3,wb_shift_red=0.5 --bench 1000
+"""
+
+TEXT_FIELDS = ["film_simulation", "dynamic_range"]
+WB_FIELDS = ["wb_shift_red", "wb_shift_blue"]
+LIKEABILITY_FIELDS = [*TEXT_FIELDS, *TONE_FIELDS, *WB_FIELDS]
+
+# Frame column each setting is compared on
+FIELD_COLUMNS = {**{f: f for f in TEXT_FIELDS}, **{f: TONE_COLUMNS[f] for f in TONE_FIELDS}, **{f: f for f in WB_FIELDS}}
+
+DEFAULT_WEIGHTS = {field: 1.0 for field in LIKEABILITY_FIELDS}
+BLOCK_SIZE = 1 << 20  # target x recipe scores per block (4 MB of float32)
+
+class LikeabilityIndex:
+    """
+    index = LikeabilityIndex(frame)             # any DataFrame with the FIELD_COLUMNS
+    index.scores([target])                      # (1, N) scores against every recipe
+    rows, scores = index.top_k(targets, k=5)    # (m, k) best recipes per target
+    """
+    def __init__(self, frame, weights=None):
+        unknown = set(weights or {}) - set(LIKEABILITY_FIELDS)
+        if unknown:
+            raise ValueError(f"No likeability setting named {', '.join(sorted(unknown))}")
+        self.frame = frame
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        # weight -> the settings (matrix rows) carrying it; a zero weight is never compared
+        self.weight_groups = {}
+        for j, field in enumerate(LIKEABILITY_FIELDS):
+            if self.weights[field]:
+                self.weight_groups.setdefault(float(self.weights[field]), []).append(j)
+        self.categories = {}
+        encoded = []
+        for field in LIKEABILITY_FIELDS:
+            column = frame[FIELD_COLUMNS[field]]
+            if field in TEXT_FIELDS:
+                values = pd.Categorical(column)  # a snapshot column already is one: no re-factorizing
+                self.categories[field] = {value: code for code, value in enumerate(values.categories)}
+                codes = np.asarray(values.codes, dtype=np.float64)
+                encoded.append(np.where(codes < 0, np.nan, codes))
+            else:
+                encoded.append(np.asarray(column, dtype=np.float64))
+        # One contiguous row per setting, so each comparison streams through memory
+        self.matrix = np.vstack(encoded) if encoded else np.zeros((0, len(frame)))
+
+    @classmethod
+    def from_db(cls, db_path=None, weights=None):
+        return cls(RecipeFrame.load(db_path).df, weights)
+
+    def __len__(self):
+        return self.matrix.shape[1]
+
+    def encode(self, targets):
+        """(m, 10) matrix for target dicts {setting: value}; a missing or unknown value matches nothing."""
+        out = np.full((len(targets), len(LIKEABILITY_FIELDS)), np.nan)
+        for i, target in enumerate(targets):
+            for j, field in enumerate(LIKEABILITY_FIELDS):
+                value = target.get(field)
+                if value is None:
+                    continue
+                if field in TEXT_FIELDS:
+                    value = self.categories[field].get(value)
+                    if value is None:
+                        continue
+                out[i, j] = float(value)
+        return out
+
+    def _score_block(self, encoded):
+        shape = (len(encoded), len(self))
+        scores = np.zeros(shape, dtype=np.float32)
+        matches = np.empty(shape, dtype=bool)
+        count = np.empty(shape, dtype=np.uint8)
+        for weight, rows in self.weight_groups.items():
+            count.fill(0)
+            for j in rows:
+                # (m, 1) == (1, N) -> (m, N); NaN on either side is never equal
+                np.equal(encoded[:, j, None], self.matrix[j][None, :], out=matches)
+                count += matches
+            if weight == 1:
+                scores += count
+            else:
+                scores += count * np.float32(weight)
+        return scores
+
+    def _blocks(self, encoded):
+        step = max(1, BLOCK_SIZE // max(1, len(self)))
+        for start in range(0, len(encoded), step):
+            yield start, self._score_block(encoded[start:start + step])
+
+    def scores(self, targets):
+        """Scores of every recipe against each target: an (m, N) float32 array."""
+        encoded = self._as_encoded(targets)
+        out = np.empty((len(encoded), len(self)), dtype=np.float32)
+        for start, block in self._blocks(encoded):
+            out[start:start + len(block)] = block
+        return out
+
+    def top_k(self, targets, k=10):
+        """
+        Best k recipes for each target (dicts, or rows from encode()).
+        Returns (rows, scores), each (m, k), best first; equal scores keep
+        corpus order, so the result is deterministic.
+        """
+        encoded = self._as_encoded(targets)
+        k = min(k, len(self))
+        rows_out = np.empty((len(encoded), k), dtype=np.int64)
+        scores_out = np.empty((len(encoded), k), dtype=np.float32)
+        if k == 0:
+            return rows_out, scores_out
+        for start, block in self._blocks(encoded):
+            # The k-th best score per target: everything above it is in, and
+            # ties at it are taken in corpus order
+            kth = -np.partition(-block, k - 1, axis=1)[:, k - 1]
+            idx = np.empty((len(block), k), dtype=np.int64)
+            for i, candidates in enumerate(block >= kth[:, None]):
+                rows = np.flatnonzero(candidates)  # ascending, usually a handful more than k
+                if len(rows) > k:
+                    above = block[i, rows] > kth[i]
+                    rows = rows[above | (np.cumsum(~above) <= k - above.sum())]
+                idx[i] = rows
+            part = np.take_along_axis(block, idx, axis=1)
+            order = np.argsort(-part, axis=1, kind="stable")
+            rows_out[start:start + len(block)] = np.take_along_axis(idx, order, axis=1)
+            scores_out[start:start + len(block)] = np.take_along_axis(part, order, axis=1)
+        return rows_out, scores_out
+
+    def _as_encoded(self, targets):
+        if isinstance(targets, np.ndarray):
+            return targets.astype(np.float64, copy=False).reshape(-1, len(LIKEABILITY_FIELDS))
+        return self.encode(list(targets))
+
+    def best_matches(self, target, k=10):
+        """The k most likeable recipes for one target, as dicts with the frame's id / name / url / film_simulation and score."""
+        rows, scores = self.top_k([target], k)
+        keys = [c for c in ("id", "name", "url", "film_simulation") if c in self.frame.columns]
+        results = []
+        for row, score in zip(rows[0], scores[0]):
+            record = self.frame.iloc[row]
+            results.append({**{key: record[key] for key in keys}, "score": float(score)})
+        return results
+
+def consensus_target(conn):
+    """The most common value of every likeability setting (ties: lowest value), read from recipe_counts."""
+    target = {field: setting_mode(conn, FIELD_COLUMNS[field]) for field in [*TONE_FIELDS, *WB_FIELDS]}
+    for field in TEXT_FIELDS:
+        target[field] = next((value for value, _ in value_counts(conn, field) if value != ''), None)
+    return target
+
+def _parse_weights(text):
+    weights = {}
+    for item in filter(None, (text or "").split(",")):
+        field, _, value = item.partition("=")
+        weights[field.strip()] = float(value)
+    return weights
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank recipes by how many settings they share with the consensus")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--weights", help="Per-setting weights, e.g. film_simulation=3,wb_shift_red=0.5 (default 1 each)")
+    parser.add_argument("--bench", type=int, metavar="N", help="Time top-k for N what-if targets (the consensus with one setting changed)")
+    add_db_argument(parser)
+    args = parser.parse_args()
+    set_db_path(args.db)
+    init_db()
+
+    start = time.perf_counter()
+    index = LikeabilityIndex.from_db(weights=_parse_weights(args.weights))
+    print(f"Encoded {len(index)} recipes in {time.perf_counter() - start:.2f}s")
+
+    conn = database.connect(readonly=True)
+    target = consensus_target(conn)
+    conn.close()
+    print("Consensus: " + ", ".join(f"{field}={target[field]}" for field in LIKEABILITY_FIELDS))
+    for m in index.best_matches(target, args.k):
+        print(f"  {m['score']:5.1f}  #{m['id']}  {m['name']}  [{m['film_simulation']}]  {m['url']}")
+
+    if args.bench:
+        # Each what-if copies the consensus and takes one setting from a random recipe
+        rng = np.random.default_rng(0)
+        queries = np.repeat(index.encode([target]), args.bench, axis=0)
+        fields = rng.integers(0, len(LIKEABILITY_FIELDS), args.bench)
+        donors = rng.integers(0, max(1, len(index)), args.bench)
+        if len(index):
+            queries[np.arange(args.bench), fields] = index.matrix[fields, donors]
+        start = time.perf_counter()
+        index.top_k(queries, args.k)
+        elapsed = time.perf_counter() - start
+        print(f"{args.bench} targets x {len(index)} recipes in {elapsed:.3f}s ({args.bench / elapsed:,.0f} targets/s)")
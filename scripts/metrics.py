@@ -0,0 +1,149 @@
+import json
+import bisect
+import threading
+
+"""
+Crawl Metrics
+-------------
+Per-stage timings and counters for a scrape run, written at the end as a
+JSON report and as a Prometheus text-format file (node_exporter's textfile
+collector can pick that up as-is).
+
+Stages:
+- rate_limit_wait: time a fetch spent waiting for its token bucket
+- ttfb:            request sent -> response headers (DNS + connect + server time)
+- fetch:           whole fetch including the body download
+- parse:           parse_fetched_page, measured inside the worker process
+- save:            one RecipeWriter flush (a whole batch in one transaction)
+"""
+# Upper bounds in seconds, Prometheus style (an implicit +Inf bucket follows)
+BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.samples = []
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.samples.append(seconds)
+        self.total += seconds
+
+    def quantile(self, q):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def to_dict(self):
+        n = len(self.samples)
+        return {
+            "count": n,
+            "sum": round(self.total, 6),
+            "mean": round(self.total / n, 6) if n else None,
+            "p50": self.quantile(0.50),
+            "p90": self.quantile(0.90),
+            "p99": self.quantile(0.99),
+            "max": max(self.samples) if n else None,
+            "buckets": {str(le): c for le, c in zip(self.buckets + ["+Inf"], self.counts)},
+        }
+
+class CrawlMetrics:
+    """
+    Thread-safe collector shared by the fetch threads, the store stage and the
+    RecipeWriter. `fields` maps the label to report coverage under to the
+    recipe key it lives in (see record_fields).
+    """
+    def __init__(self, fields=None):
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.http_status = {}
+        self.counters = {"bytes_downloaded": 0, "retries": 0, "pages_parsed": 0, "failures": 0}
+        self.fields = dict(fields or {})
+        self.field_hits = {label: 0 for label in self.fields}
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            if stage not in self.timings:
+                self.timings[stage] = Histogram()
+            self.timings[stage].observe(seconds)
+
+    def incr(self, counter, amount=1):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def record_response(self, status_code, num_bytes):
+        with self.lock:
+            code = str(status_code)
+            self.http_status[code] = self.http_status.get(code, 0) + 1
+            self.counters["bytes_downloaded"] += num_bytes
+
+    def record_fields(self, data):
+        """
+        Counts which settings a parsed recipe had. A field of "full_settings"
+        means the label itself is a key inside data["full_settings"].
+        """
+        full_settings = data.get("full_settings") or {}
+        with self.lock:
+            self.counters["pages_parsed"] += 1
+            for label, field in self.fields.items():
+                if field == "full_settings":
+                    present = isinstance(full_settings, dict) and label in full_settings
+                else:
+                    present = data.get(field) is not None
+                if present:
+                    self.field_hits[label] += 1
+
+    def to_dict(self):
+        with self.lock:
+            parsed = self.counters["pages_parsed"]
+            return {
+                "counters": dict(self.counters),
+                "http_status": dict(sorted(self.http_status.items())),
+                "timings": {stage: h.to_dict() for stage, h in self.timings.items()},
+                "field_coverage": {
+                    label: {"count": hits, "ratio": round(hits / parsed, 4) if parsed else None}
+                    for label, hits in self.field_hits.items()
+                },
+            }
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def to_prometheus(self, prefix="fujisims_crawl"):
+        report = self.to_dict()
+        lines = []
+
+        lines.append(f"# HELP {prefix}_stage_seconds Time spent per crawl stage.")
+        lines.append(f"# TYPE {prefix}_stage_seconds histogram")
+        for stage, h in report["timings"].items():
+            cumulative = 0
+            for le, count in h["buckets"].items():
+                cumulative += count
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {h["sum"]}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {h["count"]}')
+
+        lines.append(f"# HELP {prefix}_http_responses_total HTTP responses by status code.")
+        lines.append(f"# TYPE {prefix}_http_responses_total counter")
+        for code, count in report["http_status"].items():
+            lines.append(f'{prefix}_http_responses_total{{code="{code}"}} {count}')
+
+        for name, value in report["counters"].items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+
+        lines.append(f"# HELP {prefix}_field_coverage_ratio Share of parsed recipes that had each setting.")
+        lines.append(f"# TYPE {prefix}_field_coverage_ratio gauge")
+        for label, cov in report["field_coverage"].items():
+            if cov["ratio"] is not None:
+                lines.append(f'{prefix}_field_coverage_ratio{{field="{label}"}} {cov["ratio"]}')
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        with open(path, "w") as f:
+            f.write(self.to_prometheus())
@@ -0,0 +1,94 @@
+import os
+import json
+import gzip
+import hashlib
+import tempfile
+from datetime import datetime, timezone
+
+"""
+Raw HTML Cache
+--------------
+Every page the scraper downloads is kept on disk so the parser can be re-run
+without touching the network (see `scrape.py --replay`).
+
+Layout:
+    html_cache/
+        objects/ab/ab12...ef.html.gz   gzip'd page body, named by its SHA-256
+        refs/<sha1(url)>.json          {"url", "sensor", "source", "kind", "sha256", "fetched_at"}
+
+Blobs are content addressed, so a page that hasn't changed between crawls is
+stored once, and a ref always points at the latest body seen for its URL.
+Both kinds of file are written to a temp file and renamed into place, which
+keeps the cache consistent when several fetch workers write at once.
+"""
+DEFAULT_CACHE_DIR = "html_cache"
+
+def _atomic_write(path, payload):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+class PageCache:
+    def __init__(self, root=DEFAULT_CACHE_DIR):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.refs_dir = os.path.join(root, "refs")
+
+    def _blob_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}.html.gz")
+
+    def _ref_path(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.refs_dir, f"{key}.json")
+
+    def put(self, url, html, sensor=None, kind="recipe", source=None):
+        """Stores a page body and points the URL's ref at it. Returns the blob digest."""
+        digest = hashlib.sha256(html).hexdigest()
+        blob_path = self._blob_path(digest)
+        if not os.path.exists(blob_path):
+            # mtime=0 keeps the compressed bytes reproducible for identical pages
+            _atomic_write(blob_path, gzip.compress(html, mtime=0))
+
+        ref = {
+            "url": url,
+            "sensor": sensor,
+            "source": source,
+            "kind": kind,
+            "sha256": digest,
+            "fetched_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        _atomic_write(self._ref_path(url), json.dumps(ref).encode("utf-8"))
+        return digest
+
+    def read_blob(self, digest):
+        with gzip.open(self._blob_path(digest), "rb") as f:
+            return f.read()
+
+    def get(self, url):
+        """Returns the latest cached body for a URL, or None if we never fetched it."""
+        try:
+            with open(self._ref_path(url), "r") as f:
+                ref = json.load(f)
+        except FileNotFoundError:
+            return None
+        return self.read_blob(ref["sha256"])
+
+    def entries(self, kind=None):
+        """Yields ref dicts (sorted by URL, so replays are reproducible)."""
+        if not os.path.isdir(self.refs_dir):
+            return
+        refs = []
+        for name in os.listdir(self.refs_dir):
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(self.refs_dir, name), "r") as f:
+                ref = json.load(f)
+            if kind is None or ref.get("kind") == kind:
+                refs.append(ref)
+        yield from sorted(refs, key=lambda r: r["url"])
@@ -0,0 +1,175 @@
+import os
+import queue
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+"""
+Crawl Pipeline
+--------------
+Fetching is I/O bound, parsing is CPU bound (BeautifulSoup holds the GIL),
+and SQLite wants a single writer. So the crawl runs as three stages joined
+by bounded queues:
+
+    jobs --> [fetch threads] --q--> [parse processes] --q--> [store: calling thread]
+
+When a queue fills up, the stage feeding it blocks. That backpressure keeps
+memory flat however far ahead the fetchers get.
+
+The fetch stage can be split into lanes (one per recipe source). Each lane has
+its own job queue and fetch threads, so a slow site only ties up its own
+workers while the others keep feeding the shared parse pool.
+"""
+_DONE = object()
+
+# A job whose fetch raised, or a payload whose parse raised, on its way to the store stage
+_Failed = namedtuple("_Failed", ["item", "error"])
+
+# jobs: iterable of work items; fetch: fetch(job) -> payload or None; fetchers: thread count
+Lane = namedtuple("Lane", ["name", "jobs", "fetch", "fetchers"])
+
+def _default_parsers():
+    return max(1, (os.cpu_count() or 1) - 1)
+
+def run_pipeline(jobs, fetch, parse, store, fetchers=4, parsers=None, queue_size=32, failed=None):
+    """
+    jobs:  any iterable (it may do I/O itself, e.g. index discovery); consumed on its own thread
+    fetch: fetch(job) -> payload, or None to drop the job. Runs on `fetchers` threads.
+    parse: parse(payload) -> result, or None. Runs in a ProcessPoolExecutor, so it
+           must be a picklable module-level function. parsers=0 parses inline instead.
+    store: store(result). Runs on the calling thread only.
+    failed: failed(item, error) for a job whose fetch raised or a payload whose
+            parse raised (else they're only printed). Also on the calling thread.
+
+    Returns counts of jobs, fetched payloads, stored results and failures.
+    """
+    return run_lanes([Lane("default", jobs, fetch, fetchers)], parse, store,
+                     parsers=parsers, queue_size=queue_size, failed=failed)
+
+def run_lanes(lanes, parse, store, parsers=None, queue_size=32, failed=None):
+    """
+    Same as run_pipeline, but with one independent fetch stage per Lane.
+    Stats also include per-lane job/fetch counts under stats["lanes"].
+    """
+    if parsers is None:
+        parsers = _default_parsers()
+
+    fetched_q = queue.Queue(maxsize=queue_size)
+    parsed_q = queue.Queue(maxsize=queue_size)
+    stats = {"jobs": 0, "fetched": 0, "stored": 0, "failed": 0,
+             "lanes": {lane.name: {"jobs": 0, "fetched": 0} for lane in lanes}}
+    stats_lock = threading.Lock()
+
+    def bump(key, lane=None):
+        with stats_lock:
+            stats[key] += 1
+            if lane is not None:
+                stats["lanes"][lane.name][key] += 1
+
+    def feed(lane, job_q):
+        try:
+            for job in lane.jobs:
+                bump("jobs", lane)
+                job_q.put(job)
+        except Exception as e:
+            print(f"Job discovery failed for {lane.name}: {e}")
+            bump("failed")
+        finally:
+            for _ in range(lane.fetchers):
+                job_q.put(_DONE)
+
+    def fetch_worker(lane, job_q):
+        while True:
+            job = job_q.get()
+            if job is _DONE:
+                break
+            try:
+                payload = lane.fetch(job)
+            except Exception as e:
+                print(f"Fetch failed for {job}: {e}")
+                bump("failed")
+                parsed_q.put(_Failed(job, e))
+                continue
+            if payload is not None:
+                bump("fetched", lane)
+                fetched_q.put(payload)
+
+    def parse_dispatcher(pool):
+        # Keeps at most `queue_size` parses in flight; waiting on the oldest
+        # future is what pushes back on the fetchers when parsing falls behind.
+        in_flight = deque()
+
+        def drain_one():
+            payload, future = in_flight.popleft()
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Parse failed: {e}")
+                bump("failed")
+                parsed_q.put(_Failed(payload, e))
+                return
+            if result is not None:
+                parsed_q.put(result)
+
+        while True:
+            payload = fetched_q.get()
+            if payload is _DONE:
+                break
+            if pool is None:
+                try:
+                    result = parse(payload)
+                except Exception as e:
+                    print(f"Parse failed: {e}")
+                    bump("failed")
+                    parsed_q.put(_Failed(payload, e))
+                    continue
+                if result is not None:
+                    parsed_q.put(result)
+                continue
+
+            in_flight.append((payload, pool.submit(parse, payload)))
+            while len(in_flight) >= queue_size or (in_flight and in_flight[0][1].done()):
+                drain_one()
+        while in_flight:
+            drain_one()
+        parsed_q.put(_DONE)
+
+    pool = ProcessPoolExecutor(max_workers=parsers) if parsers > 0 else None
+    feeders = []
+    fetch_threads = []
+    for lane in lanes:
+        job_q = queue.Queue(maxsize=queue_size)
+        feeders.append(threading.Thread(target=feed, args=(lane, job_q), name=f"pipeline-feed-{lane.name}", daemon=True))
+        fetch_threads += [
+            threading.Thread(target=fetch_worker, args=(lane, job_q), name=f"pipeline-fetch-{lane.name}-{i}", daemon=True)
+            for i in range(lane.fetchers)
+        ]
+    dispatcher = threading.Thread(target=parse_dispatcher, args=(pool,), name="pipeline-parse", daemon=True)
+
+    try:
+        for t in feeders + fetch_threads:
+            t.start()
+        dispatcher.start()
+
+        def close_fetch_stage():
+            for t in fetch_threads:
+                t.join()
+            fetched_q.put(_DONE)
+        threading.Thread(target=close_fetch_stage, name="pipeline-fetch-close", daemon=True).start()
+
+        # Store stage: the only place results are written
+        while True:
+            result = parsed_q.get()
+            if result is _DONE:
+                break
+            if isinstance(result, _Failed):
+                if failed is not None:
+                    failed(result.item, result.error)
+                continue
+            store(result)
+            bump("stored")
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    return stats
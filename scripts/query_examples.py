@@ -1,10 +1,9 @@
-import sqlite3
+import argparse
 import pandas as pd
-
-DB_PATH = "film_recipes.db"
+from database import get_connection, set_db_path, add_db_argument
 
 def run_query(query, params=()):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(readonly=True)
     try:
         # Use pandas for pretty printing if available, else standard cursor
         df = pd.read_sql_query(query, conn, params=params)
@@ -22,7 +21,9 @@ def main():
     run_query("SELECT DISTINCT film_simulation FROM recipes ORDER BY film_simulation")
 
     print("\n--- 2. Recipes using 'Reala Ace' ---")
-    run_query("SELECT name, sensor, iso FROM recipes WHERE film_simulation LIKE ?", ('%Reala Ace%',))
+    # Phrase match on the film_simulation column of the full-text index (see search.py)
+    run_query("SELECT r.name, r.sensor, r.iso FROM recipes_fts JOIN recipes r ON r.id = recipes_fts.rowid "
+              "WHERE recipes_fts MATCH ? ORDER BY recipes_fts.rank", ('film_simulation : "Reala Ace"',))
 
     print("\n--- 3. Count of Recipes per Sensor ---")
     run_query("SELECT sensor, COUNT(*) as count FROM recipes GROUP BY sensor")
@@ -34,6 +35,17 @@ def main():
     print("\n--- 5. Recipes with Positive Red Shift (> 2) ---")
     run_query("SELECT name, white_balance, wb_shift_red FROM recipes WHERE wb_shift_red > 2 LIMIT 5")
 
+    print("\n--- 6. Strong Color Chrome Effect with Color +2 or more ---")
+    # fs_* columns are indexed views into full_settings (see PROMOTED_SETTINGS in database.py)
+    run_query("SELECT name, color, fs_color_chrome_effect FROM recipes "
+              "WHERE fs_color_chrome_effect = ? AND color_value >= ? LIMIT 5", ('Strong', 2))
+
+    print("\n--- 7. Recipes Edited Since They Were First Scraped ---")
+    # recipe_revisions only gets a row when a re-crawl finds different content
+    run_query("SELECT r.name, COUNT(*) - 1 as edits, MAX(v.recorded_at) as last_edit "
+              "FROM recipe_revisions v JOIN recipes r ON r.id = v.recipe_id "
+              "GROUP BY v.recipe_id HAVING COUNT(*) > 1 ORDER BY last_edit DESC LIMIT 5")
+
 if __name__ == "__main__":
     # Ensure pandas is installed for this script, or fall back to printing rows
     try:
@@ -45,5 +57,8 @@ if __name__ == "__main__":
         import sys
         import subprocess
         subprocess.check_call([sys.executable, "-m", "pip", "install", "pandas", "tabulate"])
-    
+
+    parser = argparse.ArgumentParser(description="Run example queries against the recipe database")
+    add_db_argument(parser)
+    set_db_path(parser.parse_args().db)
     main()
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+from snapshot import load_snapshot
+from setting_values import TONE_FIELDS, TONE_COLUMNS
+
+"""
+RecipeFrame
+-----------
+The whole `recipes` table as one pandas DataFrame, loaded once (from the
+columnar snapshot, see snapshot.py) and shared by every chart in
+analyze_trends.py, with the chart-specific parsing already done.
+
+Tone settings come as the typed *_value columns (parsed once at save time,
+see setting_values.py). The few flags only the charts need are parsed here,
+with vectorized str methods over each column's distinct values (the snapshot
+keeps text dictionary-encoded), then spread to the rows with one take() on
+the codes. A corpus of 100k recipes with 40 distinct ISO strings runs the
+regex 40 times, not 100k.
+
+Parsed columns, next to the raw ones:
+    iso_first         first number in the ISO text ("Auto, up to ISO 6400" -> 6400)
+    iso_auto          ISO text mentions "up to", any case like SQL LIKE (an Auto-ISO limit)
+    grain_strong      grain_effect mentions "Strong"
+    chrome_level      Color Chrome Effect: 0 Off/unknown, 1 Weak, 2 Strong
+    is_bw             film simulation is Acros / Monochrome / Sepia / B&W
+"""
+
+# Columns read from the snapshot (charts read tone settings from the typed *_value columns)
+FRAME_COLUMNS = [
+    "id", "name", "sensor", "url", "film_simulation", "dynamic_range", "grain_effect", "white_balance",
+    *TONE_FIELDS, "iso", "exposure_compensation", "wb_shift_red", "wb_shift_blue",
+    *TONE_COLUMNS.values(), "dr_value", "iso_max", "grain_strength",
+    "fs_color_chrome_effect",
+]
+
+BW_PATTERN = r'acros|monochrome|bw|b&w|sepia'
+
+def _by_category(column, parse, fill=np.nan):
+    """
+    Applies parse() (vectorized, Series -> array) to a Categorical's categories
+    and spreads the result to every row; NULL rows get `fill`.
+    """
+    parsed = np.asarray(parse(pd.Series(column.categories, dtype=object)))
+    codes = np.asarray(column.codes)
+    out = np.take(parsed, codes, mode="clip") if len(parsed) else np.full(len(codes), fill)
+    if np.any(codes < 0):
+        out = np.where(codes < 0, fill, out)
+    return out
+
+def chrome_level(values):
+    """ "Strong" -> 2, "Weak" -> 1, anything else -> 0 (as the old SQL CASE did)."""
+    lowered = values.str.lower()
+    return np.where(lowered.str.contains("strong", regex=False), 2,
+                    np.where(lowered.str.contains("weak", regex=False), 1, 0))
+
+# Simple cleanup to grouping main DR types
+def clean_dr(val):
+    if '400' in val: return 'DR400'
+    if '200' in val: return 'DR200'
+    return 'DR100/Standard'
+
+class RecipeFrame:
+    """
+    rf = RecipeFrame.load()
+    rf.df is the DataFrame (one row per recipe, raw + parsed columns).
+    """
+    def __init__(self, df):
+        self.df = df
+
+    def __len__(self):
+        return len(self.df)
+
+    @classmethod
+    def load(cls, db_path=None, rebuild="auto"):
+        snapshot = load_snapshot(db_path, rebuild=rebuild)
+        columns = [c for c in FRAME_COLUMNS if c in snapshot.kinds]
+        return cls(cls.parse(snapshot.frame(columns)))
+
+    @staticmethod
+    def parse(df):
+        """Adds the parsed columns to a snapshot frame (text columns are Categoricals)."""
+        df = df.copy()
+        df["iso_first"] = _by_category(df["iso"].array, lambda v: v.str.extract(r'(\d+)')[0].astype(float))
+        df["iso_auto"] = _by_category(df["iso"].array, lambda v: v.str.contains("up to", case=False, regex=False), fill=False)
+        df["grain_strong"] = _by_category(df["grain_effect"].array,
+                                          lambda v: v.str.contains("Strong", regex=False), fill=False)
+        df["is_bw"] = _by_category(df["film_simulation"].array,
+                                   lambda v: v.str.lower().str.contains(BW_PATTERN), fill=False)
+        df["chrome_level"] = _by_category(df["fs_color_chrome_effect"].array, chrome_level, fill=0)
+        for column in ("iso_auto", "grain_strong", "is_bw"):
+            df[column] = df[column].astype(bool)
+        df["chrome_level"] = df["chrome_level"].astype(int)
+        return df
@@ -1,8 +1,18 @@
 import requests
-from bs4 import BeautifulSoup
-import re
+from requests.adapters import HTTPAdapter
 import time
-from database import save_recipe
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+from database import (
+    init_db, load_http_validators, RecipeWriter, set_db_path, add_db_argument,
+    add_to_frontier, claim_frontier, frontier_summary, FRESHNESS_SECONDS, MAX_ATTEMPTS,
+)
+from page_cache import PageCache, DEFAULT_CACHE_DIR
+from pipeline import run_pipeline, run_lanes, Lane
+from sources import SOURCES, DEFAULT_SOURCE, DEFAULT_PARSER, HAS_LXML, KEY_MAP, get_source
+from metrics import CrawlMetrics
 
 # Headers to mimic a browser
 HEADERS = {
@@ -10,167 +20,355 @@ HEADERS = {
 }
 # NOTE: FujiXWeekly and other sites often block non-browser user agents (403 Forbidden).
 # The User-Agent above mimics a standard Chrome browser on macOS.
+# Site-specific settings (index URLs, selectors, per-site budgets) live in sources.py.
 
-TARGET_URLS = {
-    "X-Trans V": "https://fujixweekly.com/fujifilm-x-trans-v-recipes/",
-    "X-Trans IV": "https://fujixweekly.com/fujifilm-x-trans-iv-recipes/",
-    # Add others as needed
-}
+DEFAULT_CONCURRENCY = 4
+REQUEST_TIMEOUT = 30
+DEFAULT_METRICS_PREFIX = "crawl_metrics"
+
+
+class TokenBucket:
+    """
+    Classic token bucket: refills `rate` tokens per second up to `capacity`.
+    acquire() blocks the calling thread until a token is available.
+    """
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class HostRateLimiter:
+    """
+    One TokenBucket per host, so the politeness limit applies to each site
+    separately no matter how many workers are hitting it.
+    """
+    def __init__(self, rps, burst=1):
+        self.rps = rps
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.rps, self.burst)
+                self.buckets[host] = bucket
+        bucket.acquire()
+
+def make_session(pool_size=DEFAULT_CONCURRENCY):
+    """
+    One pooled Session for the whole crawl: keep-alive connections are reused
+    across pages, and the pool is sized so every worker can hold a connection.
+    """
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
-def clean_text(text):
-    return text.replace('\xa0', ' ').strip()
+def fetch(url, session, limiter=None, validators=None, metrics=None):
+    """
+    GET a page through the shared session. If we have validators from a
+    previous crawl, send them so an unchanged page costs a bodiless 304.
+    """
+    headers = {}
+    if validators:
+        etag, last_modified = validators
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
 
-def parse_recipe_page(url, sensor):
+    start = time.perf_counter()
+    if limiter:
+        limiter.wait(url)
+    sent = time.perf_counter()
+    response = session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    if metrics:
+        metrics.observe("rate_limit_wait", sent - start)
+        metrics.observe("ttfb", response.elapsed.total_seconds())
+        metrics.observe("fetch", time.perf_counter() - sent)
+        metrics.record_response(response.status_code, len(response.content))
+    if response.status_code != 304:
+        response.raise_for_status()
+    return response
+
+def fetch_recipe_page(url, sensor, source, session, limiter=None, validators=None, cache=None,
+                      parser=DEFAULT_PARSER, metrics=None):
+    """
+    Network half of a recipe. Always returns a picklable page dict for
+    parse_fetched_page: with "html" on success, "not_modified" on a 304,
+    or "error" if the fetch failed (so the failure reaches the frontier).
+    """
     print(f"Scraping {url}...")
     try:
-        response = requests.get(url, headers=HEADERS)
-        response.raise_for_status()
+        response = fetch(url, session, limiter, validators, metrics)
     except Exception as e:
         print(f"Failed to fetch {url}: {e}")
-        return None
-
-    soup = BeautifulSoup(response.content, 'html.parser')
-    
-    # Try to find the title
-    title_tag = soup.find('h1', class_='entry-title')
-    title = clean_text(title_tag.text) if title_tag else "Unknown Recipe"
-
-    # Main content area
-    content = soup.find('div', class_='entry-content')
-    if not content:
-        print("No content found")
-        return None
-
-    # Extraction Logic
-    # We look for lines like "Film Simulation: ..."
-    # This is tricky because formatting varies. We'll scan all text nodes or p tags.
-    
-    data = {
-        "name": title,
-        "sensor": sensor,
+        return {"url": url, "sensor": sensor, "error": f"fetch: {e}"}
+
+    if response.status_code == 304:
+        return {"url": url, "sensor": sensor, "not_modified": True}
+
+    if cache:
+        cache.put(url, response.content, sensor=sensor, kind="recipe", source=source.name)
+
+    return {
+        "html": response.content,
         "url": url,
-        "full_settings": {}
-    }
-    
-    # Mappings from text keys to DB fields
-    key_map = {
-        "Film Simulation": "film_simulation",
-        "Dynamic Range": "dynamic_range",
-        "Grain Effect": "grain_effect",
-        "White Balance": "white_balance",
-        "Highlight": "highlight",
-        "Shadow": "shadow",
-        "Color": "color",
-        "Sharpness": "sharpness",
-        "Noise Reduction": "noise_reduction",
-        "Clarity": "clarity",
-        "ISO": "iso",
-        "Exposure Compensation": "exposure_compensation",
-        # Aliases or partial matches could be added here
-        "Color Chrome Effect": "full_settings", # saving to JSON for now if not in main schema
-        "Color Chrome FX Blue": "full_settings"
+        "sensor": sensor,
+        "source": source,
+        "parser": parser,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
     }
 
-    # Iterate through paragraphs to find settings
-    # Use separator='\n' to handle <br> tags or implicit newlines
-    for p in content.find_all(['p', 'li']):
-        # Split block content into lines
-        lines = p.get_text(separator='\n').split('\n')
-        
-        for line in lines:
-            line = clean_text(line)
-            if ':' not in line:
-                continue
-                
-            parts = line.split(':', 1)
-            key = parts[0].strip()
-            value = parts[1].strip()
-            
-            # Check if this key matches one of our expected fields
-            matched_field = None
-            for k, field in key_map.items():
-                if k.lower() == key.lower():
-                    matched_field = field
-                    break
-            
-            if matched_field:
-                if matched_field == "full_settings":
-                    data["full_settings"][key] = value
-                else:
-                    data[matched_field] = value
-            else:
-                 # Store unrecognized keys in full_settings just in case
-                 if len(key) < 50: # Avoid capturing long sentences that resemble keys
-                    data["full_settings"][key] = value
-
-    # Parse White Balance Shift
-    if "white_balance" in data:
-        wb_text = data["white_balance"]
-        # Look for Red shift
-        r_match = re.search(r'([+-]?\d+)\s*R(?:ed)?', wb_text, re.IGNORECASE)
-        if r_match:
-            data["wb_shift_red"] = int(r_match.group(1))
-            
-        # Look for Blue shift
-        b_match = re.search(r'([+-]?\d+)\s*B(?:lue)?', wb_text, re.IGNORECASE)
-        if b_match:
-            data["wb_shift_blue"] = int(b_match.group(1))
+def parse_fetched_page(page):
+    """
+    CPU half of a recipe. Module-level so the pipeline can run it in worker processes.
+    Returns the recipe dict, or passes the page through with "error" set.
+    """
+    if "html" not in page:
+        return page  # 304s and fetch failures just flow on to the store stage
+
+    start = time.perf_counter()
+    try:
+        data = page["source"].parse(page["html"], page["url"], page["sensor"], page["parser"])
+    except Exception as e:
+        return {"url": page["url"], "sensor": page["sensor"], "error": f"parse: {e}"}
+    if not data:
+        return {"url": page["url"], "sensor": page["sensor"], "error": "parse: no recipe content found"}
 
+    data["etag"] = page.get("etag")
+    data["last_modified"] = page.get("last_modified")
+    data["parse_seconds"] = time.perf_counter() - start
     return data
 
-def scrape_sensor_index(sensor, index_url):
-    print(f"Fetching index for {sensor}...")
-    response = requests.get(index_url, headers=HEADERS)
-    soup = BeautifulSoup(response.content, 'html.parser')
-    
-    links = set()
-    content = soup.find('div', class_='entry-content')
-    
-    # Find all links in the content
-    for a in content.find_all('a', href=True):
-        href = a['href']
-        # Filter for recipe pages (heuristics: contains fujixweekly.com, has date or slug)
-        if "fujixweekly.com" in href and _is_likely_recipe(href, index_url):
-            links.add(href)
-            
-    print(f"Found {len(links)} potential recipes.")
-    return list(links)
-
-def _is_likely_recipe(href, index_url):
-    """
-    Heuristic Filter:
-    We don't want to scrape "About" pages or "Categories".
-    True recipe pages on this site usually have a date structure in the URL (e.g. /2023/05/12/).
-    """
-    # Basic filter: exclude tag archives, internal nav, etc.
-    if href == index_url: return False
-    if "/tag/" in href: return False
-    if "/category/" in href: return False
-    if "/author/" in href: return False
-    # Recipes usually have a date YYYY/MM/DD in URL
-    if re.search(r'/\d{4}/\d{2}/\d{2}/', href):
-        return True
-    return False
-
-def main():
-    for sensor, url in TARGET_URLS.items():
-        recipe_links = scrape_sensor_index(sensor, url)
-        
-        count = 0
-        for link in recipe_links:
-            # Removed limit for production run, but let's keep a small limit per sensor for this verification step if user wants FULL scrape.
-            # User asked to "scrape all", so we should process all.
-            # However, for this agent step, I'll limit to 5 per sensor to verify the fix first, then user can clear the DB and run fully if desired.
-            # Actually, the user asked to "store up it", implying full execution.
-            # I will remove the limit.
-    
-            recipe_data = parse_recipe_page(link, sensor)
-            if recipe_data:
-                print(f"Title: {recipe_data['name']}")
-                print(f"Sim: {recipe_data.get('film_simulation')}")
-                save_recipe(recipe_data)
-                time.sleep(1) # Be polite
-        
+class SourceClient:
+    """
+    Per-source crawl state: its own connection pool and rate limiter, sized by
+    the source's budget, so sources never compete for workers or tokens.
+    """
+    def __init__(self, source, validators, cache=None, parser=DEFAULT_PARSER, metrics=None):
+        self.source = source
+        self.session = make_session(pool_size=source.concurrency)
+        self.limiter = HostRateLimiter(source.rps)
+        self.validators = validators
+        self.cache = cache
+        self.parser = parser
+        self.metrics = metrics
+
+    def get_index(self, url, sensor):
+        # Index pages always fetched in full: they are where new recipes show up.
+        response = fetch(url, self.session, self.limiter, metrics=self.metrics)
+        if self.cache:
+            self.cache.put(url, response.content, sensor=sensor, kind="index", source=self.source.name)
+        return response.content
+
+    def discover(self):
+        return [(url, sensor, self.source.name) for url, sensor in self.source.discover(self.get_index)]
+
+    def fetch_job(self, job):
+        url, sensor = job[:2]
+        return fetch_recipe_page(url, sensor, self.source, self.session, self.limiter,
+                                 self.validators.get(url), self.cache, self.parser, self.metrics)
+
+    def close(self):
+        self.session.close()
+
+def _print_recipe(recipe_data):
+    print(f"Title: {recipe_data['name']}")
+    print(f"Sim: {recipe_data.get('film_simulation')}")
+
+def _write_metrics(metrics, prefix):
+    metrics.write_json(f"{prefix}.json")
+    metrics.write_prometheus(f"{prefix}.prom")
+    print(f"Metrics written to {prefix}.json and {prefix}.prom")
+
+def crawl(sources=None, cache_dir=DEFAULT_CACHE_DIR, parser=DEFAULT_PARSER, parsers=None,
+          discover=True, freshness_seconds=FRESHNESS_SECONDS, max_attempts=MAX_ATTEMPTS,
+          metrics_prefix=DEFAULT_METRICS_PREFIX):
+    """
+    Runs the crawl as a fetch -> parse -> store pipeline (see pipeline.py).
+    Every source gets its own lane of fetch threads (source.concurrency) and
+    rate limiter (source.rps); all lanes share the parse processes, and this
+    thread is the only SQLite writer. Sources are interleaved, so the crawl
+    takes as long as the slowest source rather than the sum of all of them.
+
+    Work comes from the crawl_frontier table rather than straight from the
+    index pages, so a killed crawl picks up where it stopped, finished pages
+    aren't refetched inside the freshness window, and failures are retried
+    with exponential backoff (within this run if their backoff expires, or
+    on a later one).
+    """
+    init_db()
+    sources = sources or [get_source(DEFAULT_SOURCE)]
+    validators = load_http_validators()
+    cache = PageCache(cache_dir)
+    metrics = CrawlMetrics(fields=KEY_MAP)
+    clients = {source.name: SourceClient(source, validators, cache, parser, metrics) for source in sources}
+    totals = {"saved": 0, "unchanged": 0, "failed": 0}
+    finished = set()  # done in this run; never re-claimed even with a tiny freshness window
+
+    def store(result):
+        if "error" in result:
+            totals["failed"] += 1
+            metrics.incr("failures")
+            writer.mark_failed(result["url"], result["error"])
+            return
+        if not result.get("not_modified"):
+            _print_recipe(result)
+            metrics.observe("parse", result["parse_seconds"])
+            metrics.record_fields(result)
+            writer.add(result)
+            totals["saved"] += 1
+        else:
+            totals["unchanged"] += 1
+        writer.mark_done(result["url"])
+        finished.add(result["url"])
+
+    def fetch_or_parse_raised(item, error):
+        # A frontier job (url, sensor, source, attempts) or a fetched page dict. Recorded
+        # as a failure, so the frontier backs it off instead of handing it straight back.
+        url = item["url"] if isinstance(item, dict) else item[0]
+        store({"url": url, "error": f"{type(error).__name__}: {error}"})
+
+    try:
+        with RecipeWriter(metrics=metrics) as writer:
+            if discover:
+                # Discover every source at once; one broken or slow index doesn't hold up the rest.
+                with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+                    futures = {pool.submit(client.discover): name for name, client in clients.items()}
+                    for future in as_completed(futures):
+                        try:
+                            add_to_frontier(future.result())
+                        except Exception as e:
+                            print(f"Discovery failed for {futures[future]}: {e}")
+
+            while True:
+                writer.flush()  # frontier status must be on disk before we ask what's due
+                due = [job for job in claim_frontier(list(clients), freshness_seconds, max_attempts)
+                       if job[0] not in finished]
+                if not due:
+                    break
+                print(f"{len(due)} URLs due in the crawl frontier.")
+                metrics.incr("retries", sum(1 for job in due if job[3] > 0))
+                lanes = [
+                    Lane(name, [job for job in due if job[2] == name], client.fetch_job, client.source.concurrency)
+                    for name, client in clients.items()
+                ]
+                run_lanes([lane for lane in lanes if lane.jobs], parse_fetched_page, store, parsers=parsers,
+                          failed=fetch_or_parse_raised)
+    finally:
+        for client in clients.values():
+            client.close()
+
+    print(f"Crawl done: {totals['saved']} recipes saved, {totals['failed']} failures.")
+    print(f"{totals['unchanged']} pages unchanged since the last crawl (304 Not Modified).")
+    print(f"Frontier: {frontier_summary()}")
+    _write_metrics(metrics, metrics_prefix)
+
+def replay(cache_dir=DEFAULT_CACHE_DIR, parser=DEFAULT_PARSER, parsers=None,
+           metrics_prefix=DEFAULT_METRICS_PREFIX):
+    """
+    Re-run parse + save over every cached recipe page, with no network access.
+    Use this after changing a source's parser (e.g. parse_recipe_html or KEY_MAP).
+    """
+    init_db()
+    cache = PageCache(cache_dir)
+    metrics = CrawlMetrics(fields=KEY_MAP)
+    sources = {}
+
+    def load_cached(ref):
+        # Pages cached before sources existed have no "source"; they're all fujixweekly.
+        name = ref.get("source") or DEFAULT_SOURCE
+        if name not in sources:
+            sources[name] = get_source(name)
+        return {"html": cache.read_blob(ref["sha256"]), "url": ref["url"], "sensor": ref["sensor"],
+                "source": sources[name], "parser": parser}
+
+    def store(result):
+        if "error" in result:
+            print(f"Failed to parse {result['url']}: {result['error']}")
+            metrics.incr("failures")
+        else:
+            metrics.observe("parse", result["parse_seconds"])
+            metrics.record_fields(result)
+            writer.add(result)
+
+    with RecipeWriter(metrics=metrics) as writer:
+        stats = run_pipeline(cache.entries(kind="recipe"), load_cached, parse_fetched_page, store,
+                             fetchers=1, parsers=parsers)
+    print(f"Replayed {stats['stored']} cached pages from {cache_dir}.")
+    _write_metrics(metrics, metrics_prefix)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape film simulation recipes into film_recipes.db")
+    parser.add_argument("--sources", default=DEFAULT_SOURCE,
+                        help=f"Comma-separated recipe sources to crawl (known: {', '.join(sorted(SOURCES))})")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="Fetch threads per source (default: each source's own budget)")
+    parser.add_argument("--rps", type=float, default=None,
+                        help="Max requests per second per host (default: each source's own budget)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help=f"Where raw HTML is cached (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--replay", action="store_true",
+                        help="Re-parse the cached HTML instead of crawling (no network)")
+    parser.add_argument("--parser", choices=["html.parser", "lxml"], default=DEFAULT_PARSER,
+                        help="BeautifulSoup backend for recipe pages (lxml must be installed)")
+    parser.add_argument("--parsers", type=int, default=None,
+                        help="Parse worker processes (default: CPU count - 1; 0 parses in-process)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip index discovery and only work through the existing crawl frontier")
+    parser.add_argument("--fresh-hours", type=float, default=FRESHNESS_SECONDS / 3600,
+                        help="Don't refetch pages completed within this many hours (default: 24)")
+    parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS,
+                        help=f"Give up on a URL after this many failures (default: {MAX_ATTEMPTS})")
+    parser.add_argument("--metrics-prefix", default=DEFAULT_METRICS_PREFIX,
+                        help=f"Write the run's metrics to PREFIX.json and PREFIX.prom (default: {DEFAULT_METRICS_PREFIX})")
+    add_db_argument(parser)
+    args = parser.parse_args(argv)
+    set_db_path(args.db)
+
+    if args.concurrency is not None and args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.rps is not None and args.rps <= 0:
+        parser.error("--rps must be positive")
+    if args.parsers is not None and args.parsers < 0:
+        parser.error("--parsers can't be negative")
+    if args.parser == "lxml" and not HAS_LXML:
+        parser.error("--parser lxml needs the lxml package (pip install lxml)")
+
+    if args.replay:
+        replay(cache_dir=args.cache_dir, parser=args.parser, parsers=args.parsers,
+               metrics_prefix=args.metrics_prefix)
+        return
+
+    try:
+        sources = [get_source(name.strip(), rps=args.rps, concurrency=args.concurrency)
+                   for name in args.sources.split(",") if name.strip()]
+    except ValueError as e:
+        parser.error(str(e))
+    crawl(sources=sources, cache_dir=args.cache_dir, parser=args.parser, parsers=args.parsers,
+          discover=not args.resume, freshness_seconds=args.fresh_hours * 3600,
+          max_attempts=args.max_attempts, metrics_prefix=args.metrics_prefix)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,137 @@
+import re
+import time
+import random
+import argparse
+import database
+from database import init_db, set_db_path, add_db_argument
+
+"""
+Recipe Full-Text Search
+-----------------------
+Free-text search over recipe names, film simulations, grain / white balance
+and every full_settings entry, backed by the recipes_fts FTS5 index (kept in
+sync with `recipes` by triggers, see database.py).
+
+    python scripts/search.py kodak portra warm
+    python scripts/search.py '"classic chrome"' port*
+
+Query syntax:
+    word            every word must match (implicit AND)
+    port*           prefix match
+    "classic neg"   exact phrase
+    x-trans         punctuation splits a word into a phrase ("x trans")
+
+Results are ranked by BM25, with a match in the name counting most. A
+lookup costs roughly the number of rows its terms match (BM25 needs every
+match's score and each term's document count), not the corpus size: a
+selective query is well under a millisecond, one word present in every
+recipe is not. `--bench` reports both ends.
+"""
+
+# BM25 weight per FTS_COLUMNS entry (name, sensor, film_simulation, grain_effect, white_balance, full_settings)
+COLUMN_WEIGHTS = [10.0, 1.0, 5.0, 1.0, 1.0, 2.0]
+
+TERM_RE = re.compile(r'"([^"]*)"?|(\S+)')
+WORD_RE = re.compile(r'\w+')
+
+def fts_query(text):
+    """
+    Turns user input into a safe FTS5 MATCH expression: every word is quoted,
+    so FTS5 operators and column filters typed by accident can't cause a
+    syntax error. Returns "" when there's nothing to search for.
+    """
+    terms = []
+    for phrase, word in TERM_RE.findall(text):
+        words = WORD_RE.findall(phrase or word)
+        if not words:
+            continue
+        term = '"' + " ".join(words) + '"'
+        if not phrase and word.endswith("*"):
+            term += "*"
+        terms.append(term)
+    return " ".join(terms)
+
+# Ranked and cut to LIMIT inside the FTS table, so only the top rows are joined to recipes
+SEARCH_SQL = f"""
+    SELECT r.id, r.name, r.sensor, r.film_simulation, r.url, hits.score
+    FROM (
+        SELECT rowid, bm25(recipes_fts, {", ".join(str(w) for w in COLUMN_WEIGHTS)}) AS score
+        FROM recipes_fts
+        WHERE recipes_fts MATCH ?
+        ORDER BY score
+        LIMIT ?
+    ) hits
+    JOIN recipes r ON r.id = hits.rowid
+    ORDER BY hits.score
+"""
+
+def search_recipes(text, limit=20, conn=None, raw=False):
+    """
+    Best `limit` matches for `text`, best first, as dicts with id, name,
+    sensor, film_simulation, url and score (higher is better).
+    raw=True passes `text` to FTS5 unchanged (full FTS5 query syntax).
+    """
+    query = text if raw else fts_query(text)
+    if not query:
+        return []
+    own_conn = conn is None
+    if own_conn:
+        conn = database.connect(readonly=True)
+    try:
+        rows = conn.execute(SEARCH_SQL, (query, limit)).fetchall()
+    finally:
+        if own_conn:
+            conn.close()
+    # bm25() is lower-is-better; flip it so callers can read it as relevance
+    return [{"id": r[0], "name": r[1], "sensor": r[2], "film_simulation": r[3], "url": r[4], "score": -r[5]}
+            for r in rows]
+
+def _bench(conn, n, limit):
+    # Terms drawn from the index vocabulary (mostly rare, a few in nearly every
+    # row), 1-2 per query, some as prefixes. The p99 shows the common-word case.
+    conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.recipes_fts_vocab USING fts5vocab(main, recipes_fts, row)")
+    vocab = [row[0] for row in conn.execute("SELECT term FROM temp.recipes_fts_vocab")]
+    if not vocab:
+        print("No recipes to benchmark against.")
+        return
+    rng = random.Random(0)
+    queries = []
+    for _ in range(n):
+        picked = rng.sample(vocab, min(len(vocab), rng.randint(1, 2)))
+        if rng.random() < 0.3 and len(picked[-1]) > 3:
+            picked[-1] = picked[-1][:3] + "*"
+        queries.append(" ".join(picked))
+
+    timings = []
+    for q in queries:
+        start = time.perf_counter()
+        search_recipes(q, limit, conn=conn)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    total = sum(timings)
+    print(f"{n} searches in {total:.3f}s: p50 {timings[len(timings) // 2] * 1000:.3f} ms, "
+          f"p99 {timings[int(len(timings) * 0.99)] * 1000:.3f} ms ({len(vocab):,} indexed terms)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full-text search over recipe names and settings")
+    parser.add_argument("query", nargs="*", help="Words, \"phrases\" and prefix* terms")
+    parser.add_argument("-n", "--limit", type=int, default=10)
+    parser.add_argument("--raw", action="store_true", help="Pass the query to FTS5 unchanged")
+    parser.add_argument("--bench", type=int, metavar="N", help="Time N searches built from indexed terms")
+    add_db_argument(parser)
+    args = parser.parse_args()
+    set_db_path(args.db)
+    init_db()
+
+    conn = database.connect(readonly=True)
+    if args.query:
+        text = " ".join(args.query)
+        start = time.perf_counter()
+        results = search_recipes(text, args.limit, conn=conn, raw=args.raw)
+        elapsed = time.perf_counter() - start
+        print(f"{len(results)} results for {text!r} ({elapsed * 1000:.2f} ms):")
+        for r in results:
+            print(f"  {r['score']:6.2f}  #{r['id']}  {r['name']}  [{r['film_simulation']}]  {r['url']}")
+    if args.bench:
+        _bench(conn, args.bench, args.limit)
+    conn.close()
@@ -0,0 +1,101 @@
+import re
+import json
+
+"""
+Numeric Setting Values
+----------------------
+Recipes are scraped as free text ("+1", "-1/3 to +2/3", "Strong, Small",
+"Auto, up to ISO 6400"). These helpers turn that text into numbers once,
+when the recipe is saved, so analytics can filter and aggregate in SQL
+instead of re-running regexes over every row for every chart.
+
+Anything that doesn't parse becomes None (NULL), never a guess.
+"""
+
+# The tone settings compared across recipes (consensus, likeability, similarity, bootstrap)
+TONE_FIELDS = ["highlight", "shadow", "color", "sharpness", "noise_reduction", "clarity"]
+
+# recipes column -> typed column holding its number
+TONE_COLUMNS = {
+    **{field: f"{field}_value" for field in TONE_FIELDS},
+    "exposure_compensation": "exposure_compensation_value",
+}
+
+# Typed column -> SQLite type, in the order they were added to `recipes`
+NUMERIC_COLUMNS = {
+    **{column: "REAL" for column in TONE_COLUMNS.values()},
+    "dr_value": "INTEGER",
+    "iso_max": "INTEGER",
+    "grain_strength": "INTEGER",
+    "grain_size": "INTEGER",
+    "chrome_effect": "INTEGER",
+    "chrome_fx_blue": "INTEGER",
+}
+
+# Off / Weak / Strong (grain, Color Chrome Effect, Color Chrome FX Blue)
+STRENGTH_LEVELS = {"off": 0, "weak": 1, "strong": 2}
+GRAIN_SIZES = {"small": 1, "large": 2}
+
+NUMBER_RE = re.compile(r'([+-]?\d+(?:\.\d+)?)(?:\s*/\s*(\d+))?')
+
+def setting_number(text):
+    """
+    First number in a setting, e.g. "+2" -> 2.0, "-1.5" -> -1.5, "+1/3 to +1" -> 0.333.
+    Ranges keep their first value, as analyze_trends.py's old parse_setting_val
+    did. Unlike it, fractions are divided out (it read "+1/3" as 1.0), and text
+    with no number is None rather than 0.0, so charts leave those recipes out
+    instead of counting them at 0.
+    """
+    if not text:
+        return None
+    match = NUMBER_RE.search(str(text))
+    if not match:
+        return None
+    value = float(match.group(1))
+    if match.group(2):
+        denominator = int(match.group(2))
+        if denominator == 0:
+            return None
+        value = value / denominator
+    return round(value, 3)
+
+def dr_value(text):
+    """ "DR400" -> 400, "DR-Auto" / "Auto" -> None."""
+    match = re.search(r'(100|200|400)', str(text or ""))
+    return int(match.group(1)) if match else None
+
+def iso_max(text):
+    """Top of the Auto-ISO range ("Auto, up to ISO 6400" -> 6400), or the fixed ISO."""
+    values = [int(n) for n in re.findall(r'\d+', str(text or "")) if int(n) >= 100]
+    return max(values) if values else None
+
+def strength(text):
+    """ "Off" -> 0, "Weak" -> 1, "Strong" -> 2 (first one mentioned wins)."""
+    match = re.search(r'\b(off|weak|strong)\b', str(text or ""), re.IGNORECASE)
+    return STRENGTH_LEVELS[match.group(1).lower()] if match else None
+
+def grain_size(text):
+    """ "Strong, Large" -> 2, "Weak, Small" -> 1; None when the size isn't given."""
+    match = re.search(r'\b(small|large)\b', str(text or ""), re.IGNORECASE)
+    return GRAIN_SIZES[match.group(1).lower()] if match else None
+
+def numeric_settings(data):
+    """
+    Typed values for a recipe dict (or a row of the same columns).
+    full_settings may be a dict or its JSON string.
+    """
+    full_settings = data.get("full_settings") or {}
+    if isinstance(full_settings, str):
+        try:
+            full_settings = json.loads(full_settings)
+        except ValueError:
+            full_settings = {}
+
+    values = {column: setting_number(data.get(field)) for field, column in TONE_COLUMNS.items()}
+    values["dr_value"] = dr_value(data.get("dynamic_range"))
+    values["iso_max"] = iso_max(data.get("iso"))
+    values["grain_strength"] = strength(data.get("grain_effect"))
+    values["grain_size"] = grain_size(data.get("grain_effect"))
+    values["chrome_effect"] = strength(full_settings.get("Color Chrome Effect"))
+    values["chrome_fx_blue"] = strength(full_settings.get("Color Chrome FX Blue"))
+    return values
@@ -0,0 +1,251 @@
+import time
+import argparse
+import numpy as np
+from setting_values import numeric_settings, TONE_FIELDS, TONE_COLUMNS
+from snapshot import load_snapshot
+from database import init_db, set_db_path, add_db_argument
+
+"""
+Recipe Similarity Search
+------------------------
+"Show me recipes like this one." Every recipe becomes a fixed-length vector:
+
+    film simulation   one-hot
+    dynamic range     one-hot over DR100 / DR200 / DR400 / Auto-or-unknown
+    tone              highlight, shadow, color, sharpness, noise reduction, clarity
+    white balance     red / blue shift
+
+Each block is scaled by the square root of its weight, so plain squared
+Euclidean distance between vectors is the weighted distance between recipes.
+The whole corpus is one float32 matrix (built from the columnar snapshot), and
+a batch of queries is a single matrix product plus argpartition.
+
+Past ~100k recipes, build_ivf() adds an approximate index (k-means cells;
+only the `nprobe` closest cells are searched).
+"""
+
+# Relative importance of each block. Two different film simulations are
+# 2 * weight apart (two one-hot positions differ), a tone step is 1 * weight.
+DEFAULT_WEIGHTS = {
+    "film_simulation": 4.0,
+    "dynamic_range": 1.0,
+    "tone": 1.0,
+    "wb_shift": 0.5,
+}
+DR_LEVELS = [100, 200, 400]
+QUERY_CHUNK = 64  # queries per matrix product, keeps the distance block at QUERY_CHUNK x N
+
+class SimilarityIndex:
+    def __init__(self, snapshot, weights=None):
+        self.snapshot = snapshot
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        codes, categories = snapshot.codes("film_simulation")
+        self.simulations = {str(name): i for i, name in enumerate(categories)}
+        self.ids = np.asarray(snapshot["id"])
+        self.row_of_id = {int(recipe_id): row for row, recipe_id in enumerate(self.ids)}
+        self.matrix = self._encode_columns(
+            np.asarray(codes),
+            np.asarray(snapshot["dr_value"]),
+            np.column_stack([np.asarray(snapshot[TONE_COLUMNS[f]]) for f in TONE_FIELDS]) if len(snapshot) else
+            np.zeros((0, len(TONE_FIELDS))),
+            np.column_stack([np.asarray(snapshot["wb_shift_red"]), np.asarray(snapshot["wb_shift_blue"])]) if len(snapshot) else
+            np.zeros((0, 2)),
+        )
+        self.norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+        self.ivf = None
+
+    @classmethod
+    def from_db(cls, db_path=None, weights=None):
+        return cls(load_snapshot(db_path), weights)
+
+    def _encode_columns(self, sim_codes, dr_values, tone, wb):
+        """Vectors for n recipes given as arrays (sim code -1 = unknown, NaN = missing setting)."""
+        n = len(sim_codes)
+        w = {name: np.sqrt(weight) for name, weight in self.weights.items()}
+
+        sims = np.zeros((n, len(self.simulations)), dtype=np.float32)
+        known = sim_codes >= 0
+        sims[np.nonzero(known)[0], sim_codes[known]] = w["film_simulation"]
+
+        dr = np.zeros((n, len(DR_LEVELS) + 1), dtype=np.float32)
+        dr_index = np.full(n, len(DR_LEVELS))
+        for i, level in enumerate(DR_LEVELS):
+            dr_index[dr_values == level] = i
+        dr[np.arange(n), dr_index] = w["dynamic_range"]
+
+        # A missing setting counts as 0 (the camera default)
+        tone = np.nan_to_num(tone.astype(np.float32)) * w["tone"]
+        wb = np.nan_to_num(wb.astype(np.float32)) * w["wb_shift"]
+        return np.hstack([sims, dr, tone, wb]).astype(np.float32)
+
+    def encode(self, recipes):
+        """Vectors for recipe dicts (raw text settings, as scraped or as a DB row)."""
+        typed = [numeric_settings(r) for r in recipes]
+        return self._encode_columns(
+            np.array([self.simulations.get(r.get("film_simulation"), -1) for r in recipes], dtype=np.int64),
+            np.array([np.nan if t["dr_value"] is None else t["dr_value"] for t in typed], dtype=np.float64),
+            np.array([[np.nan if t[TONE_COLUMNS[f]] is None else t[TONE_COLUMNS[f]] for f in TONE_FIELDS] for t in typed],
+                     dtype=np.float64).reshape(len(recipes), len(TONE_FIELDS)),
+            np.array([[np.nan if r.get(c) is None else r.get(c) for c in ("wb_shift_red", "wb_shift_blue")] for r in recipes],
+                     dtype=np.float64).reshape(len(recipes), 2),
+        )
+
+    def _exact(self, queries, k, rows=None):
+        """Top-k rows (indices into `rows`, or the whole matrix) and squared distances for each query."""
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        norms = self.norms if rows is None else self.norms[rows]
+        k = min(k, len(matrix))
+        all_idx = np.empty((len(queries), k), dtype=np.int64)
+        all_dist = np.empty((len(queries), k), dtype=np.float32)
+        for start in range(0, len(queries), QUERY_CHUNK):
+            q = queries[start:start + QUERY_CHUNK]
+            # |q - x|^2 = |q|^2 + |x|^2 - 2 q.x, for the whole chunk at once
+            dist = np.einsum("ij,ij->i", q, q)[:, None] + norms[None, :] - 2.0 * (q @ matrix.T)
+            idx = np.argpartition(dist, k - 1, axis=1)[:, :k] if k < len(matrix) else np.tile(np.arange(len(matrix)), (len(q), 1))
+            part = np.take_along_axis(dist, idx, axis=1)
+            order = np.argsort(part, axis=1, kind="stable")
+            all_idx[start:start + len(q)] = np.take_along_axis(idx, order, axis=1)
+            all_dist[start:start + len(q)] = np.maximum(np.take_along_axis(part, order, axis=1), 0.0)
+        if rows is not None:
+            all_idx = rows[all_idx]
+        return all_idx, all_dist
+
+    def build_ivf(self, n_lists=None, iterations=10, seed=0):
+        """
+        Approximate index: k-means over the corpus into n_lists cells
+        (default sqrt(N)); search() then only scans the nprobe nearest cells.
+        An empty corpus gets no index: search() stays exact.
+        """
+        rng = np.random.default_rng(seed)
+        n = len(self.matrix)
+        if n == 0:
+            self.ivf = None
+            return self
+        n_lists = max(1, min(n, n_lists or int(np.sqrt(n))))
+        # Train on a sample; every recipe is assigned to its cell afterwards
+        sample = self.matrix[rng.choice(n, min(n, 64 * n_lists), replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assign = self._nearest_centroids(centroids, sample, 1)[:, 0]
+            counts = np.bincount(assign, minlength=n_lists)
+            sums = np.stack([np.bincount(assign, weights=sample[:, d], minlength=n_lists)
+                             for d in range(sample.shape[1])], axis=1)
+            filled = counts > 0  # an empty cell keeps its old centroid
+            centroids[filled] = (sums[filled] / counts[filled, None]).astype(np.float32)
+        assign = self._nearest_centroids(centroids, self.matrix, 1)[:, 0]
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(n_lists + 1))
+        self.ivf = {"centroids": centroids, "cells": [order[bounds[c]:bounds[c + 1]] for c in range(n_lists)]}
+        return self
+
+    @staticmethod
+    def _nearest_centroids(centroids, vectors, nprobe, chunk=16384):
+        nprobe = min(nprobe, len(centroids))
+        centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+        out = np.empty((len(vectors), nprobe), dtype=np.int64)
+        for start in range(0, len(vectors), chunk):
+            v = vectors[start:start + chunk]
+            dist = np.einsum("ij,ij->i", v, v)[:, None] + centroid_norms[None, :] - 2.0 * (v @ centroids.T)
+            idx = np.argpartition(dist, nprobe - 1, axis=1)[:, :nprobe]
+            out[start:start + chunk] = np.take_along_axis(
+                idx, np.argsort(np.take_along_axis(dist, idx, axis=1), axis=1), axis=1)
+        return out
+
+    def search(self, queries, k=10, nprobe=8):
+        """
+        Batched top-k: queries is an (m, d) array from encode() or self.matrix.
+        Returns (rows, distances), each (m, k), nearest first. Uses the IVF
+        index when one was built, exact search otherwise.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if self.ivf is None:
+            return self._exact(queries, k)
+        cells = self._nearest_centroids(self.ivf["centroids"], queries, nprobe)
+        rows_out = np.full((len(queries), k), -1, dtype=np.int64)
+        dist_out = np.full((len(queries), k), np.inf, dtype=np.float32)
+        for i, probe in enumerate(cells):
+            candidates = np.concatenate([self.ivf["cells"][c] for c in probe])
+            if len(candidates):
+                idx, dist = self._exact(queries[i:i + 1], k, candidates)
+                rows_out[i, :idx.shape[1]] = idx[0]
+                dist_out[i, :dist.shape[1]] = dist[0]
+        return rows_out, dist_out
+
+    def find_similar(self, recipe, k=10, nprobe=8):
+        """
+        The k recipes closest to `recipe`: a recipe id, a URL, or a recipe
+        dict. Returns [{"id", "name", "url", "film_simulation", "distance"}],
+        nearest first; a recipe from the corpus isn't returned as its own match.
+        """
+        self_row = None
+        if isinstance(recipe, dict):
+            query = self.encode([recipe])
+        else:
+            self_row = self._row_for(recipe)
+            query = self.matrix[self_row:self_row + 1]
+        rows, dists = self.search(query, k + (self_row is not None), nprobe)
+
+        results = []
+        for row, dist in zip(rows[0], dists[0]):
+            if row < 0 or row == self_row:
+                continue
+            results.append({"id": int(self.ids[row]), "name": self._text("name", row), "url": self._text("url", row),
+                            "film_simulation": self._text("film_simulation", row), "distance": float(np.sqrt(dist))})
+        return results[:k]
+
+    def _text(self, column, row):
+        # Straight from the mapped codes, without building a Categorical over the whole column
+        codes, categories = self.snapshot.codes(column)
+        return str(categories[codes[row]]) if codes[row] >= 0 else None
+
+    def _row_for(self, recipe):
+        if isinstance(recipe, (int, np.integer)):
+            if int(recipe) not in self.row_of_id:
+                raise KeyError(f"No recipe with id {recipe}")
+            return self.row_of_id[int(recipe)]
+        codes, categories = self.snapshot.codes("url")
+        code = np.searchsorted(categories, recipe)  # snapshot categories are sorted
+        if code == len(categories) or categories[code] != recipe:
+            raise KeyError(f"No recipe with url {recipe!r}")
+        return int(np.nonzero(codes == code)[0][0])
+
+_default_index = None
+
+def find_similar(recipe, k=10, db_path=None):
+    """Convenience wrapper around a SimilarityIndex built once per process."""
+    global _default_index
+    if _default_index is None:
+        _default_index = SimilarityIndex.from_db(db_path)
+    return _default_index.find_similar(recipe, k)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find the recipes most similar to a given one")
+    parser.add_argument("recipe", nargs="?", help="Recipe id or URL")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--ivf", action="store_true", help="Use the approximate (IVF) index")
+    parser.add_argument("--bench", type=int, metavar="N", help="Time N batched queries drawn from the corpus")
+    add_db_argument(parser)
+    args = parser.parse_args()
+    set_db_path(args.db)
+    init_db()
+
+    start = time.perf_counter()
+    index = SimilarityIndex.from_db()
+    if args.ivf:
+        index.build_ivf()
+    print(f"Indexed {len(index.matrix)} recipes x {index.matrix.shape[1]} dims in {time.perf_counter() - start:.2f}s")
+
+    if args.recipe:
+        recipe = int(args.recipe) if args.recipe.isdigit() else args.recipe
+        start = time.perf_counter()
+        matches = index.find_similar(recipe, args.k)
+        print(f"Closest to {args.recipe} ({(time.perf_counter() - start) * 1000:.1f} ms):")
+        for m in matches:
+            print(f"  {m['distance']:6.2f}  #{m['id']}  {m['name']}  [{m['film_simulation']}]  {m['url']}")
+
+    if args.bench:
+        queries = index.matrix[np.random.default_rng(0).integers(0, len(index.matrix), args.bench)]
+        start = time.perf_counter()
+        index.search(queries, args.k)
+        elapsed = time.perf_counter() - start
+        print(f"{args.bench} queries in {elapsed:.3f}s ({args.bench / elapsed:,.0f} queries/s)")
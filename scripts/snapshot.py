@@ -0,0 +1,181 @@
+import os
+import json
+import shutil
+import argparse
+import numpy as np
+import pandas as pd
+import database
+from database import init_db, set_db_path, add_db_argument
+
+"""
+Columnar Recipe Snapshot
+------------------------
+A copy of the `recipes` table laid out for analysis: one .npy file per column,
+so numpy can memory-map it and loading takes milliseconds however big the
+table grows. Loading builds no per-row Python objects.
+
+Layout (next to the database, e.g. film_recipes.db.snapshot/):
+    manifest.json                 {"fingerprint", "rows", "columns": {name: kind}}
+    <column>.npy                  numeric columns: float64, NaN for NULL (id: int64)
+    <column>.codes.npy            text columns, dictionary-encoded: int32 codes, -1 for NULL
+    <column>.categories.npy       ... and their sorted distinct values
+
+full_settings (raw JSON) is left out; its popular keys are already columns
+(typed setting columns and the fs_* generated ones).
+
+The fingerprint is the size and mtime of the database and its WAL file, so
+load_snapshot() only re-exports after something wrote to the database (a
+checkpoint can cause one spare rebuild; a change is never missed).
+"""
+SNAPSHOT_FORMAT = 1
+SKIP_COLUMNS = {"full_settings"}
+
+def default_snapshot_dir(db_path=None):
+    return f"{db_path or database.DB_PATH}.snapshot"
+
+def db_fingerprint(db_path=None):
+    path = db_path or database.DB_PATH
+    parts = [SNAPSHOT_FORMAT]
+    for name in (path, f"{path}-wal"):
+        try:
+            st = os.stat(name)
+        except FileNotFoundError:
+            st = None
+        # An empty WAL comes and goes as connections open and close; it holds no changes
+        parts.append([st.st_size, st.st_mtime_ns] if st and st.st_size else None)
+    return parts
+
+def _column_kinds(conn):
+    kinds = {}
+    for _, name, decl, *_ in conn.execute("PRAGMA table_xinfo(recipes)"):
+        if name in SKIP_COLUMNS:
+            continue
+        decl = (decl or "").upper()
+        if name == "id":
+            kinds[name] = "id"
+        elif "INT" in decl or "REAL" in decl:
+            kinds[name] = "numeric"
+        else:
+            kinds[name] = "category"
+    return kinds
+
+def export_snapshot(db_path=None, snapshot_dir=None):
+    """Writes a fresh snapshot (to a temp dir, then swapped into place). Returns the manifest."""
+    snapshot_dir = snapshot_dir or default_snapshot_dir(db_path)
+    fingerprint = db_fingerprint(db_path)  # taken first: a write during export means a rebuild next time
+
+    conn = database.connect(db_path, readonly=True)
+    try:
+        kinds = _column_kinds(conn)
+        rows = conn.execute(f"SELECT {', '.join(kinds)} FROM recipes ORDER BY id").fetchall()
+    finally:
+        conn.close()
+    columns = list(zip(*rows)) if rows else [() for _ in kinds]
+
+    tmp_dir = f"{snapshot_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for (name, kind), values in zip(kinds.items(), columns):
+        if kind == "id":
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.array(values, dtype=np.int64))
+        elif kind == "numeric":
+            np.save(os.path.join(tmp_dir, f"{name}.npy"),
+                    np.array([np.nan if v is None else v for v in values], dtype=np.float64))
+        else:
+            codes, categories = pd.factorize(pd.Series(values, dtype=object), sort=True)
+            np.save(os.path.join(tmp_dir, f"{name}.codes.npy"), codes.astype(np.int32))
+            np.save(os.path.join(tmp_dir, f"{name}.categories.npy"), np.array([str(c) for c in categories], dtype=str))
+
+    manifest = {"format": SNAPSHOT_FORMAT, "fingerprint": fingerprint, "rows": len(rows), "columns": kinds}
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    old_dir = f"{snapshot_dir}.old-{os.getpid()}"
+    if os.path.exists(snapshot_dir):
+        os.rename(snapshot_dir, old_dir)
+    os.rename(tmp_dir, snapshot_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return manifest
+
+def _read_manifest(snapshot_dir):
+    try:
+        with open(os.path.join(snapshot_dir, "manifest.json")) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def is_fresh(db_path=None, snapshot_dir=None):
+    manifest = _read_manifest(snapshot_dir or default_snapshot_dir(db_path))
+    return manifest is not None and manifest.get("fingerprint") == db_fingerprint(db_path)
+
+class RecipeSnapshot:
+    """
+    Memory-mapped view of a snapshot. Columns are opened lazily:
+    snapshot["shadow_value"] is a read-only float64 memmap, a text column is a
+    pandas Categorical over the mapped codes. frame(columns) builds a
+    DataFrame of just the columns asked for.
+    """
+    def __init__(self, snapshot_dir):
+        self.dir = snapshot_dir
+        self.manifest = _read_manifest(snapshot_dir)
+        if self.manifest is None:
+            raise FileNotFoundError(f"No snapshot in {snapshot_dir}")
+        self.kinds = self.manifest["columns"]
+        self.rows = self.manifest["rows"]
+        self._cache = {}
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def columns(self):
+        return list(self.kinds)
+
+    def _load(self, name):
+        return np.load(os.path.join(self.dir, name), mmap_mode="r")
+
+    def codes(self, name):
+        """Raw int32 codes (-1 = NULL) and categories of a text column, both memory-mapped."""
+        return self._load(f"{name}.codes.npy"), self._load(f"{name}.categories.npy")
+
+    def __getitem__(self, name):
+        if name not in self.kinds:
+            raise KeyError(name)
+        if name not in self._cache:
+            if self.kinds[name] == "category":
+                codes, categories = self.codes(name)
+                self._cache[name] = pd.Categorical.from_codes(codes, categories=pd.Index(categories, dtype=object))
+            else:
+                self._cache[name] = self._load(f"{name}.npy")
+        return self._cache[name]
+
+    def frame(self, columns=None):
+        columns = columns or self.columns
+        return pd.DataFrame({name: self[name] for name in columns}, copy=False)
+
+def load_snapshot(db_path=None, snapshot_dir=None, rebuild="auto"):
+    """
+    Opens the snapshot for the database, re-exporting it first when the
+    database changed since (rebuild="auto"), always (True) or never (False).
+    """
+    snapshot_dir = snapshot_dir or default_snapshot_dir(db_path)
+    if rebuild is True or (rebuild == "auto" and not is_fresh(db_path, snapshot_dir)):
+        export_snapshot(db_path, snapshot_dir)
+    return RecipeSnapshot(snapshot_dir)
+
+if __name__ == "__main__":
+    import time
+    parser = argparse.ArgumentParser(description="Export the recipes table to a memory-mapped columnar snapshot")
+    add_db_argument(parser)
+    parser.add_argument("--out", help="Snapshot directory (default: <db>.snapshot)")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the snapshot is up to date")
+    args = parser.parse_args()
+    set_db_path(args.db)
+    init_db()
+
+    start = time.perf_counter()
+    fresh = not args.force and is_fresh(snapshot_dir=args.out)
+    snapshot = load_snapshot(snapshot_dir=args.out, rebuild=True if args.force else "auto")
+    elapsed = time.perf_counter() - start
+    state = "up to date" if fresh else "rebuilt"
+    print(f"Snapshot {snapshot.dir}: {len(snapshot)} recipes, {len(snapshot.columns)} columns ({state}, {elapsed * 1000:.0f} ms)")
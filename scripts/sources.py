@@ -0,0 +1,225 @@
+import re
+from bs4 import BeautifulSoup, SoupStrainer
+
+"""
+Recipe Sources
+--------------
+Everything that depends on one site's layout lives in a Source adapter:
+where its recipes are listed (discover), how to read a recipe page (parse),
+and how hard we're allowed to hit it (rps / concurrency).
+
+scrape.py gives every source its own session, rate limiter and fetch
+workers, so adding a site (or another sensor index) never slows the others.
+Source instances are pickled into the parse worker processes, so keep them
+to plain data.
+"""
+
+TARGET_URLS = {
+    "X-Trans V": "https://fujixweekly.com/fujifilm-x-trans-v-recipes/",
+    "X-Trans IV": "https://fujixweekly.com/fujifilm-x-trans-iv-recipes/",
+    # Add others as needed
+}
+
+# Mappings from text keys to DB fields
+KEY_MAP = {
+    "Film Simulation": "film_simulation",
+    "Dynamic Range": "dynamic_range",
+    "Grain Effect": "grain_effect",
+    "White Balance": "white_balance",
+    "Highlight": "highlight",
+    "Shadow": "shadow",
+    "Color": "color",
+    "Sharpness": "sharpness",
+    "Noise Reduction": "noise_reduction",
+    "Clarity": "clarity",
+    "ISO": "iso",
+    "Exposure Compensation": "exposure_compensation",
+    # Aliases or partial matches could be added here
+    "Color Chrome Effect": "full_settings", # saving to JSON for now if not in main schema
+    "Color Chrome FX Blue": "full_settings"
+}
+# Lower-cased once, so matching a line is a dict lookup instead of a scan over KEY_MAP.
+# (str.lower rather than casefold, to match exactly the keys the old scan matched.)
+KEY_LOOKUP = {k.lower(): field for k, field in KEY_MAP.items()}
+
+# Only the parts of the page parse_recipe_html reads: the title and the post body.
+# The strainer sees the raw class attribute ("entry-title big"), so split it ourselves.
+RECIPE_BLOCK_CLASSES = {"entry-title", "entry-content"}
+
+def _is_recipe_block_class(value):
+    if not value:
+        return False
+    classes = value.split() if isinstance(value, str) else value
+    return not RECIPE_BLOCK_CLASSES.isdisjoint(classes)
+
+RECIPE_STRAINER = SoupStrainer(["h1", "div"], class_=_is_recipe_block_class)
+
+# lxml is a lot faster than the stdlib parser but optional; pick it with --parser lxml.
+try:
+    import lxml  # noqa: F401
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+DEFAULT_PARSER = "html.parser"
+
+def clean_text(text):
+    return text.replace('\xa0', ' ').strip()
+
+def parse_recipe_html(html, url, sensor, parser=DEFAULT_PARSER, strain=True):
+    """
+    Extract a recipe dict from a page body.
+
+    With strain=True only the title and `div.entry-content` are turned into a
+    tree (SoupStrainer); the sidebar, comments and footer that make up most of
+    a WordPress page are skipped by the tree builder. strain=False builds the
+    full document and exists so verify_parser.py can check both agree.
+    """
+    soup = BeautifulSoup(html, parser, parse_only=RECIPE_STRAINER if strain else None)
+    
+    # Try to find the title
+    title_tag = soup.find('h1', class_='entry-title')
+    title = clean_text(title_tag.text) if title_tag else "Unknown Recipe"
+
+    # Main content area
+    content = soup.find('div', class_='entry-content')
+    if not content:
+        print("No content found")
+        return None
+
+    # Extraction Logic
+    # We look for lines like "Film Simulation: ..."
+    # This is tricky because formatting varies. We'll scan all text nodes or p tags.
+    
+    data = {
+        "name": title,
+        "sensor": sensor,
+        "url": url,
+        "full_settings": {}
+    }
+
+    # Iterate through paragraphs to find settings
+    # Use separator='\n' to handle <br> tags or implicit newlines
+    for p in content.find_all(['p', 'li']):
+        # Split block content into lines
+        lines = p.get_text(separator='\n').split('\n')
+        
+        for line in lines:
+            line = clean_text(line)
+            if ':' not in line:
+                continue
+                
+            parts = line.split(':', 1)
+            key = parts[0].strip()
+            value = parts[1].strip()
+            
+            # Check if this key matches one of our expected fields
+            matched_field = KEY_LOOKUP.get(key.lower())
+            
+            if matched_field:
+                if matched_field == "full_settings":
+                    data["full_settings"][key] = value
+                else:
+                    data[matched_field] = value
+            else:
+                 # Store unrecognized keys in full_settings just in case
+                 if len(key) < 50: # Avoid capturing long sentences that resemble keys
+                    data["full_settings"][key] = value
+
+    # Parse White Balance Shift
+    if "white_balance" in data:
+        wb_text = data["white_balance"]
+        # Look for Red shift
+        r_match = re.search(r'([+-]?\d+)\s*R(?:ed)?', wb_text, re.IGNORECASE)
+        if r_match:
+            data["wb_shift_red"] = int(r_match.group(1))
+            
+        # Look for Blue shift
+        b_match = re.search(r'([+-]?\d+)\s*B(?:lue)?', wb_text, re.IGNORECASE)
+        if b_match:
+            data["wb_shift_blue"] = int(b_match.group(1))
+
+    return data
+
+def _is_likely_recipe(href, index_url):
+    """
+    Heuristic Filter:
+    We don't want to scrape "About" pages or "Categories".
+    True recipe pages on this site usually have a date structure in the URL (e.g. /2023/05/12/).
+    """
+    # Basic filter: exclude tag archives, internal nav, etc.
+    if href == index_url: return False
+    if "/tag/" in href: return False
+    if "/category/" in href: return False
+    if "/author/" in href: return False
+    # Recipes usually have a date YYYY/MM/DD in URL
+    if re.search(r'/\d{4}/\d{2}/\d{2}/', href):
+        return True
+    return False
+
+class Source:
+    """Base adapter. Subclasses set `name` and implement discover() and parse()."""
+    name = None
+    rps = 1.0          # max requests per second per host
+    concurrency = 2    # fetch threads for this source
+
+    def discover(self, get):
+        """
+        Yields (url, sensor) for every recipe page.
+        get(url, sensor) fetches an index page (rate limited, cached) and returns its bytes.
+        """
+        raise NotImplementedError
+
+    def parse(self, html, url, sensor, parser=DEFAULT_PARSER):
+        """Returns a recipe dict (see database.RECIPE_FIELDS), or None if the page has no recipe."""
+        raise NotImplementedError
+
+class FujiXWeeklySource(Source):
+    """fujixweekly.com: one WordPress index page per sensor, recipes linked from its post body."""
+    name = "fujixweekly"
+    rps = 1.0
+    concurrency = 4
+
+    def __init__(self, index_urls=None, host="fujixweekly.com", rps=None, concurrency=None):
+        self.index_urls = dict(index_urls or TARGET_URLS)
+        self.host = host
+        if rps is not None:
+            self.rps = rps
+        if concurrency is not None:
+            self.concurrency = concurrency
+
+    def discover(self, get):
+        for sensor, index_url in self.index_urls.items():
+            print(f"Fetching index for {sensor}...")
+            links = self.index_links(get(index_url, sensor), index_url)
+            print(f"Found {len(links)} potential recipes.")
+            for link in links:
+                yield link, sensor
+
+    def index_links(self, html, index_url):
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        links = set()
+        content = soup.find('div', class_='entry-content')
+        
+        # Find all links in the content
+        for a in content.find_all('a', href=True):
+            href = a['href']
+            # Filter for recipe pages (heuristics: contains fujixweekly.com, has date or slug)
+            if self.host in href and _is_likely_recipe(href, index_url):
+                links.add(href)
+        return list(links)
+
+    def parse(self, html, url, sensor, parser=DEFAULT_PARSER):
+        return parse_recipe_html(html, url, sensor, parser)
+
+# Registry used by --sources and by the frontier's `source` column.
+SOURCES = {
+    FujiXWeeklySource.name: FujiXWeeklySource,
+}
+DEFAULT_SOURCE = FujiXWeeklySource.name
+
+def get_source(name, **kwargs):
+    try:
+        return SOURCES[name](**kwargs)
+    except KeyError:
+        raise ValueError(f"Unknown source '{name}'. Known sources: {', '.join(sorted(SOURCES))}")
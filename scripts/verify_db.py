@@ -1,10 +1,9 @@
-import sqlite3
 import json
-
-DB_PATH = "film_recipes.db"
+import argparse
+from database import get_connection, set_db_path, add_db_argument
 
 def verify():
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(readonly=True)
     cursor = conn.cursor()
     
     # Count
@@ -25,4 +24,7 @@ def verify():
     conn.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the recipe count and a random sample recipe")
+    add_db_argument(parser)
+    set_db_path(parser.parse_args().db)
     verify()
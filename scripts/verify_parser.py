@@ -0,0 +1,49 @@
+import json
+import time
+import argparse
+from page_cache import PageCache, DEFAULT_CACHE_DIR
+from sources import parse_recipe_html, HAS_LXML
+
+def verify(cache_dir=DEFAULT_CACHE_DIR, parser="html.parser"):
+    """
+    Parses every cached recipe page twice: the full-document html.parser tree
+    (the original behaviour) and the strained fast path. Reports any page
+    where the two dicts differ, plus the time each path took.
+    """
+    cache = PageCache(cache_dir)
+    pages = [(ref, cache.read_blob(ref["sha256"])) for ref in cache.entries(kind="recipe")]
+    if not pages:
+        print(f"No cached recipe pages in {cache_dir}. Run scrape.py first.")
+        return False
+
+    mismatches = 0
+    full_time = 0.0
+    fast_time = 0.0
+    for ref, html in pages:
+        start = time.perf_counter()
+        expected = parse_recipe_html(html, ref["url"], ref["sensor"], "html.parser", strain=False)
+        full_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = parse_recipe_html(html, ref["url"], ref["sensor"], parser, strain=True)
+        fast_time += time.perf_counter() - start
+
+        # Compare the serialized form so key order counts too
+        if json.dumps(expected) != json.dumps(actual):
+            mismatches += 1
+            print(f"MISMATCH: {ref['url']}")
+
+    print(f"Pages checked: {len(pages)}")
+    print(f"Mismatches: {mismatches}")
+    print(f"Full tree (html.parser): {full_time * 1000 / len(pages):.2f} ms/page")
+    print(f"Fast path ({parser}): {fast_time * 1000 / len(pages):.2f} ms/page")
+    return mismatches == 0
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Check the fast recipe parser against the full-tree parse")
+    arg_parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    arg_parser.add_argument("--parser", choices=["html.parser", "lxml"], default="html.parser")
+    args = arg_parser.parse_args()
+    if args.parser == "lxml" and not HAS_LXML:
+        arg_parser.error("--parser lxml needs the lxml package (pip install lxml)")
+    raise SystemExit(0 if verify(args.cache_dir, args.parser) else 1)